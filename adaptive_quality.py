@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Throttling-aware adaptive quality mode for the Raspberry Pi.
+Reads CPU frequency, temperature and load from /sys and /proc, predicts how
+long each processing mode would take right now, and picks the highest
+quality mode that meets the latency target. Every result records the mode
+that produced it.
+
+Modes, from highest to lowest quality:
+    max      overlapping 3 s windows averaged, full forest, FFT resampling
+    full     first 3 s window, full forest, FFT resampling (training path)
+    fast     first 3 s window, early-exit forest (same label as full)
+    economy  first 3 s window, 50-tree subset, polyphase resampling
+
+Usage:
+    python3 adaptive_quality.py recording.wav [--target 1.0]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy.io import wavfile
+
+import audio_pipeline
+import early_exit_forest
+
+LATENCY_TARGET = 1.0      # Seconds per classification
+THROTTLE_TEMP = 80.0      # Pi 5 firmware starts throttling at 80-85 °C
+EWMA_ALPHA = 0.3          # Weight of the newest latency sample
+SUBSET_TREES = 50         # Trees used in economy mode
+WINDOW_HOP = 1500         # Hop between overlapping windows in max mode
+
+MODES = [
+    {'name': 'max', 'windows': 'multi', 'forest': 'full', 'resampler': 'fft'},
+    {'name': 'full', 'windows': 'single', 'forest': 'full', 'resampler': 'fft'},
+    {'name': 'fast', 'windows': 'single', 'forest': 'early_exit', 'resampler': 'fft'},
+    {'name': 'economy', 'windows': 'single', 'forest': 'subset', 'resampler': 'poly'},
+]
+
+# Cost of each mode relative to 'full' until it has been measured
+RELATIVE_COST = {'max': 1.5, 'full': 1.0, 'fast': 0.5, 'economy': 0.3}
+
+
+def _read_number(path):
+    """First number in a /sys or /proc file, or None if unavailable"""
+    try:
+        with open(path) as f:
+            return float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def read_system_state(sys_root='/'):
+    """
+    CPU frequency (MHz), max frequency (MHz), temperature (°C), 1-minute load
+    average and core count. Pass a directory laid out like / to mock it.
+    """
+    root = Path(sys_root)
+    cpufreq = root / "sys/devices/system/cpu/cpu0/cpufreq"
+    cur_khz = _read_number(cpufreq / "scaling_cur_freq")
+    max_khz = _read_number(cpufreq / "cpuinfo_max_freq")
+    temp_milli = _read_number(root / "sys/class/thermal/thermal_zone0/temp")
+    return {
+        'cpu_mhz': cur_khz / 1000 if cur_khz else None,
+        'max_mhz': max_khz / 1000 if max_khz else None,
+        'temp_c': temp_milli / 1000 if temp_milli is not None else None,
+        'load': _read_number(root / "proc/loadavg"),
+        'cores': os.cpu_count() or 1,
+    }
+
+
+def slowdown_factor(state):
+    """How much slower than an idle, cool, full-speed CPU we expect to run"""
+    factor = 1.0
+    if state.get('cpu_mhz') and state.get('max_mhz'):
+        factor *= max(1.0, state['max_mhz'] / state['cpu_mhz'])
+    if state.get('load') is not None:
+        # Our process gets a smaller CPU share once load exceeds the cores
+        factor *= max(1.0, (state['load'] + 1) / state['cores'])
+    if state.get('temp_c') is not None and state['temp_c'] >= THROTTLE_TEMP:
+        # About to throttle: frequency reading lags, so leave headroom
+        factor *= 1.25
+    return factor
+
+
+def describe_state(state):
+    """Short human-readable summary of a system state"""
+    parts = []
+    if state.get('cpu_mhz'):
+        parts.append(f"{state['cpu_mhz'] / 1000:.1f} GHz")
+    if state.get('temp_c') is not None:
+        parts.append(f"{state['temp_c']:.0f}°C")
+    if state.get('load') is not None:
+        parts.append(f"load {state['load']:.2f}")
+    return ", ".join(parts) or "no sensors"
+
+
+class AdaptiveClassifier:
+    """Chooses a processing mode per classification to meet a latency target"""
+
+    def __init__(self, model, latency_target=LATENCY_TARGET, state_reader=read_system_state,
+                 precision=None):
+        self.model = model
+        self.latency_target = latency_target
+        self.state_reader = state_reader
+        self.precision = precision
+        # Latency per mode at slowdown 1.0 (EWMA of measurements)
+        self.base_latency = {}
+
+    def estimate(self, mode_name, slowdown):
+        """Predicted seconds for a mode under the given slowdown"""
+        if mode_name in self.base_latency:
+            return self.base_latency[mode_name] * slowdown
+        reference = self.base_latency.get('full')
+        if reference is None:
+            # Derive a 'full' estimate from any measured mode
+            for name, latency in self.base_latency.items():
+                reference = latency / RELATIVE_COST[name]
+                break
+        if reference is None:
+            return None
+        return reference * RELATIVE_COST[mode_name] * slowdown
+
+    def choose_mode(self, state):
+        """Highest-quality mode predicted to meet the target"""
+        slowdown = slowdown_factor(state)
+        for mode in MODES:
+            estimate = self.estimate(mode['name'], slowdown)
+            if estimate is None:
+                # Nothing measured yet: start from the training path
+                return next(m for m in MODES if m['name'] == 'full')
+            if estimate <= self.latency_target:
+                return mode
+        return MODES[-1]
+
+    def _windows(self, audio, sr, mode):
+        """Preprocessed 3 s windows of one recording under `mode`"""
+        audio = audio_pipeline.to_float(audio_pipeline.first_channel(audio))
+        audio = audio_pipeline.preprocess(audio, sr, self.precision, mode['resampler'])
+        window = audio_pipeline.TARGET_LENGTH
+        if mode['windows'] == 'multi' and len(audio) > window:
+            starts = range(0, len(audio) - window + 1, WINDOW_HOP)
+        else:
+            starts = [0]
+        return np.stack([audio_pipeline.fit_length(audio[s:s + window], window) for s in starts])
+
+    def _predict(self, windows, mode):
+        """(label, confidence) for the windows of one recording"""
+        if mode['forest'] == 'full':
+            # Mean class probabilities over the windows (one window: plain predict)
+            return audio_pipeline.score_windows(self.model, windows)[1]
+        features = audio_pipeline.dwt_features(windows, self.model['feature_shape'])
+        if mode['forest'] == 'early_exit':
+            result = early_exit_forest.predict_early_exit(self.model, features)[0]
+        else:
+            result = early_exit_forest.predict_early_exit(
+                self.model, features, chunk_size=SUBSET_TREES,
+                min_trees=SUBSET_TREES, max_trees=SUBSET_TREES)[0]
+        return result['label'], result['confidence']
+
+    def classify_array(self, audio, sr):
+        """Classify in-memory audio; returns a result dict including 'mode'"""
+        audio_pipeline.check_quality(audio_pipeline.first_channel(np.asarray(audio)), sr)
+        state = self.state_reader()
+        mode = self.choose_mode(state)
+        start = time.perf_counter()
+        label, confidence = self._predict(self._windows(audio, sr, mode), mode)
+        latency = time.perf_counter() - start
+
+        # Learn this mode's latency at slowdown 1.0
+        normalized = latency / slowdown_factor(state)
+        previous = self.base_latency.get(mode['name'])
+        self.base_latency[mode['name']] = (
+            normalized if previous is None
+            else EWMA_ALPHA * normalized + (1 - EWMA_ALPHA) * previous
+        )
+        return {
+            'label': label,
+            'confidence': confidence,
+            'mode': mode['name'],
+            'latency': latency,
+            'state': describe_state(state),
+        }
+
+    def classify_file(self, audio_path):
+        """Classify a WAV file; returns a result dict including 'mode'"""
+        sr, audio = wavfile.read(audio_path)
+        return self.classify_array(audio, sr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify with throttling-aware quality")
+    parser.add_argument('audio_paths', nargs='+', help="WAV files to classify")
+    parser.add_argument('--target', type=float, default=LATENCY_TARGET,
+                        help="Latency target in seconds (default: %(default)s)")
+    args = parser.parse_args()
+
+    model = audio_pipeline.load_model()
+    adaptive = AdaptiveClassifier(model, args.target)
+
+    print(f"System: {describe_state(read_system_state())}")
+    print(f"{'File':<24} {'Prediction':<11} {'Conf':>6} {'Mode':<8} {'Latency':>9}")
+    print("-" * 62)
+    for path in args.audio_paths:
+        try:
+            result = adaptive.classify_file(path)
+        except Exception as e:
+            print(f"ERROR: {path}: {e}")
+            sys.exit(1)
+        print(f"{os.path.basename(path)[:24]:<24} {result['label']:<11} "
+              f"{result['confidence']:>5.1f}% {result['mode']:<8} {1000 * result['latency']:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
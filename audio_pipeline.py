@@ -0,0 +1,566 @@
+#!/usr/bin/env python3
+"""
+Headless preprocessing and inference pipeline for heart sound classification.
+Shared by the GUI and the command-line tools so every entry point runs the
+EXACT same preprocessing as training.
+"""
+
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from functools import lru_cache
+from math import gcd
+from pathlib import Path
+
+import numpy as np
+from scipy.io import wavfile
+from scipy import signal
+import pywt
+
+# Preprocessing parameters (must match training)
+TARGET_SR = 1000          # Downsample to 1 kHz
+HIGHPASS_CUTOFF = 20      # Butterworth high-pass cutoff (Hz)
+FILTER_ORDER = 4          # Butterworth order
+TARGET_LENGTH = 3000      # 3 seconds at 1 kHz
+WAVELET = 'coif5'         # Change to 'db4' or 'db8' if you retrain with Daubechies
+LEVEL = 5                 # DWT decomposition level
+DEFAULT_FEATURES = 3020   # Detail coefficients for coif5, level 5, 3000 samples
+
+MODEL_PATH = Path(__file__).parent / "heart_sound_rf_model.pkl"
+DATASET_PATH = Path(__file__).parent / "Yaseen_Khan"
+
+# Signal-quality gate on the raw samples (every bundled recording passes
+# with a wide margin; bundled ranges in the comments)
+MIN_DURATION = 1.0        # Seconds (bundled: 1.2-4.0 s)
+MIN_RMS = 0.003           # Fraction of full scale, about -50 dBFS (bundled: >= 0.018)
+MAX_CLIP_RATIO = 0.05     # Share of samples at full scale (bundled: <= 1.4%)
+MAX_DC_RATIO = 0.5        # |mean| / RMS (bundled: <= 0.03)
+MIN_ZCR_HZ = 20.0         # Zero crossings per second (bundled: >= 160)
+MAX_ZCR_RATIO = 0.4       # Zero crossings per sample; white noise is ~0.5 (bundled: <= 0.24)
+
+# Processing precisions: float64 reproduces training bit for bit, float32
+# halves memory traffic (see precision_report.py for measured agreement)
+PRECISIONS = {
+    'float64': np.float64,
+    'float32': np.float32,
+}
+
+# Raw PCM sample formats accepted by the in-memory API
+PCM_DTYPES = {
+    'uint8': np.uint8,
+    'int16': np.int16,
+    'int32': np.int32,
+    'float32': np.float32,
+}
+
+
+def to_float(audio):
+    """Convert integer PCM to float32 in [-1, 1)"""
+    # Scale while casting so only one float32 array is allocated
+    if audio.dtype == np.uint8:
+        # 8-bit PCM is unsigned, centred at 128
+        audio = np.subtract(audio, np.float32(128), dtype=np.float32)
+        audio *= np.float32(1 / 128.0)
+        return audio
+    elif audio.dtype == np.int16:
+        return np.multiply(audio, np.float32(1 / 32768.0), dtype=np.float32)
+    elif audio.dtype == np.int32:
+        return np.multiply(audio, np.float32(1 / 2147483648.0), dtype=np.float32)
+    return audio
+
+
+class SignalQualityError(ValueError):
+    """Recording rejected by check_quality; `reason` is a short code"""
+
+    def __init__(self, reason, message, metrics=None):
+        super().__init__(message)
+        self.reason = reason
+        self.metrics = metrics or {}
+
+
+def check_quality(audio, sr):
+    """
+    Cheap quality gate on raw mono samples (uint8/int16/int32/float), run
+    before any float conversion. Returns the measured values, or raises
+    SignalQualityError for the first failing check: 'unsupported_format',
+    'too_short', 'silent', 'clipped', 'dc_offset', 'no_signal' (too few zero
+    crossings) or 'noise'.
+    """
+    if audio.dtype == np.uint8:
+        # 8-bit PCM is unsigned, centred at 128: measure it as int8
+        audio = (audio ^ np.uint8(0x80)).view(np.int8)
+    elif np.issubdtype(audio.dtype, np.unsignedinteger):
+        raise SignalQualityError(
+            'unsupported_format', f"Unsupported sample format {audio.dtype} "
+            f"(use uint8, int16, int32 or float)")
+
+    n = len(audio)
+    duration = n / sr if sr else 0.0
+    if n < 2 or duration < MIN_DURATION:
+        raise SignalQualityError(
+            'too_short', f"Recording too short ({duration:.2f} s < {MIN_DURATION:.1f} s)",
+            {'duration': duration})
+
+    if np.issubdtype(audio.dtype, np.integer):
+        info = np.iinfo(audio.dtype)
+        full_scale = float(info.max) + 1
+        clipped = np.count_nonzero((audio >= info.max) | (audio <= info.min))
+        # Exact integer accumulation where it cannot overflow
+        acc = np.int64 if audio.dtype.itemsize <= 2 else np.float64
+    else:
+        full_scale = 1.0
+        clipped = np.count_nonzero((audio >= 1.0) | (audio <= -1.0))
+        acc = np.float64
+    rms = np.sqrt(float(np.einsum('i,i->', audio, audio, dtype=acc)) / n) / full_scale
+    dc = abs(float(audio.sum(dtype=acc)) / n) / full_scale
+    crossings = np.count_nonzero((audio[1:] < 0) != (audio[:-1] < 0))
+
+    metrics = {
+        'duration': duration,
+        'rms': rms,
+        'clip_ratio': clipped / n,
+        'dc_ratio': dc / rms if rms > 0 else 0.0,
+        'zcr_hz': crossings / duration,
+        'zcr_ratio': crossings / (n - 1),
+    }
+    if rms < MIN_RMS:
+        raise SignalQualityError(
+            'silent', f"Recording is silent (RMS {rms:.4f} < {MIN_RMS} of full scale)", metrics)
+    if metrics['clip_ratio'] > MAX_CLIP_RATIO:
+        raise SignalQualityError(
+            'clipped', f"Recording is clipped ({100 * metrics['clip_ratio']:.1f}% of samples "
+            f"at full scale)", metrics)
+    if metrics['dc_ratio'] > MAX_DC_RATIO:
+        raise SignalQualityError(
+            'dc_offset', f"Large DC offset ({metrics['dc_ratio']:.2f} of RMS); "
+            "check the sensor connection", metrics)
+    if metrics['zcr_hz'] < MIN_ZCR_HZ:
+        raise SignalQualityError(
+            'no_signal', f"Almost no zero crossings ({metrics['zcr_hz']:.0f}/s); "
+            "sensor may be disconnected", metrics)
+    if metrics['zcr_ratio'] > MAX_ZCR_RATIO:
+        raise SignalQualityError(
+            'noise', f"Recording looks like broadband noise (zero-crossing rate "
+            f"{metrics['zcr_ratio']:.2f} per sample)", metrics)
+    return metrics
+
+
+def first_channel(audio):
+    """Handle stereo (take first channel)"""
+    if len(audio.shape) > 1:
+        return audio[:, 0]
+    return audio
+
+
+@lru_cache(maxsize=None)
+def highpass_coefficients(sr=TARGET_SR, output='ba'):
+    """
+    Butterworth high-pass filter coefficients ((b, a) or 'sos'). Designed
+    once per (sr, output) and shared, so callers must not modify them.
+    """
+    nyquist = sr / 2
+    normalized_cutoff = HIGHPASS_CUTOFF / nyquist
+    return signal.butter(FILTER_ORDER, normalized_cutoff, btype='high', output=output)
+
+
+def resolve_precision(precision):
+    """Processing dtype from None, a PRECISIONS name or a NumPy dtype"""
+    if precision is None:
+        return np.float64
+    if isinstance(precision, str):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unsupported precision '{precision}' (use one of: {', '.join(PRECISIONS)})")
+        return PRECISIONS[precision]
+    return np.dtype(precision).type
+
+
+def preprocess(audio, sr, precision=None, resampler='fft'):
+    """
+    Downsample to 1 kHz, high-pass filter and z-score normalize a mono
+    float signal, or every row of a (channels, samples) array at once.
+    Returns the full-length normalized signal(s).
+
+    precision=None/'float64' is the training path. 'float32' keeps the
+    signal in float32 from decode through DWT; only the high-pass runs in
+    float64 (4th-order (b, a) coefficients at 20 Hz lose ~3e-4 relative
+    accuracy in float32, and float32 sosfiltfilt is 3x slower) and its
+    output is cast straight back.
+
+    resampler='fft' (training) uses scipy.signal.resample; 'poly' uses the
+    cheaper polyphase resample_poly, whose cost does not depend on the
+    recording length factorizing well.
+    """
+    dtype = resolve_precision(precision)
+    if dtype == np.float32:
+        audio = audio.astype(np.float32, copy=False)
+
+    # Downsample to 1 kHz
+    if sr != TARGET_SR:
+        num_samples = int(audio.shape[-1] * TARGET_SR / sr)
+        if resampler == 'poly':
+            g = gcd(int(sr), TARGET_SR)
+            audio = signal.resample_poly(audio, TARGET_SR // g, int(sr) // g,
+                                         axis=-1)[..., :num_samples]
+        else:
+            audio = signal.resample(audio, num_samples, axis=-1)
+
+    # High-pass filter (Butterworth, 20 Hz cutoff, 4th order)
+    b, a = highpass_coefficients()
+    audio = signal.filtfilt(b, a, audio, axis=-1)
+    if dtype == np.float32:
+        audio = audio.astype(np.float32)
+
+    # Z-score normalization (per channel); flat channels are left as they are
+    mean = np.mean(audio, axis=-1, keepdims=True)
+    std = np.std(audio, axis=-1, keepdims=True)
+    if audio.ndim == 1:
+        if std[0] > 0:
+            audio = (audio - mean) / std
+        return audio
+    return np.where(std > 0, (audio - mean) / np.where(std > 0, std, 1), audio)
+
+
+def fit_length(values, length):
+    """Pad with zeros or trim the last axis to exactly `length` samples"""
+    current = values.shape[-1]
+    if current > length:
+        return values[..., :length]
+    elif current < length:
+        padding = [(0, 0)] * (values.ndim - 1) + [(0, length - current)]
+        return np.pad(values, padding, mode='constant')
+    return values
+
+
+def dwt_features(window, feature_shape=None, wavelet=WAVELET, level=LEVEL):
+    """
+    DWT detail coefficients of a 3000-sample normalized window, sized to
+    the model's expected feature count. Returns shape (1, n_features), or
+    (channels, n_features) for a (channels, 3000) array of windows.
+    """
+    coeffs = pywt.wavedec(window, wavelet, level=level, axis=-1)
+
+    # Extract detail coefficients only (discard approximation)
+    features = np.concatenate(coeffs[1:], axis=-1)
+
+    expected_features = feature_shape if feature_shape else DEFAULT_FEATURES
+    return fit_length(features, expected_features).reshape(-1, expected_features)
+
+
+def extract_features(audio_path, feature_shape=None, precision=None):
+    """
+    Extract features using the EXACT same preprocessing as training:
+    1. Load WAV file
+    2. Downsample to 1 kHz
+    3. High-pass filter (Butterworth, 20 Hz)
+    4. Z-score normalization
+    5. Pad/trim to 3 seconds
+    6. DWT decomposition (coif5, level 5)
+
+    Pass precision='float32' for the reduced-precision path (see preprocess).
+    Raises SignalQualityError (before any processing) for unusable input.
+    """
+    try:
+        sr, audio = wavfile.read(audio_path)
+        return features_from_array(audio, sr, feature_shape, precision)
+    except SignalQualityError:
+        raise
+    except Exception as e:
+        raise Exception(f"Feature extraction failed: {str(e)}")
+
+
+class FeatureCache:
+    """
+    LRU cache of feature rows keyed by file identity (path, size, mtime)
+    and precision. Disabled (max_entries=0) until sized, e.g. from the
+    tuning profile written by hardware_probe.py.
+    """
+
+    def __init__(self, max_entries=0):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def resize(self, max_entries):
+        self.max_entries = max(0, int(max_entries))
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def extract_features(self, audio_path, feature_shape=None, precision=None):
+        """extract_features, served from the cache when the file is unchanged"""
+        if self.max_entries <= 0:
+            return extract_features(audio_path, feature_shape, precision)
+        stat = os.stat(audio_path)
+        key = (os.path.abspath(audio_path), stat.st_size, stat.st_mtime_ns,
+               feature_shape, str(precision))
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key].copy()
+        features = extract_features(audio_path, feature_shape, precision)
+        self.entries[key] = features
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return features.copy()
+
+
+feature_cache = FeatureCache()
+
+
+def preprocessed_window(audio, sr, precision=None):
+    """
+    The normalized TARGET_LENGTH-sample window that the DWT sees, from
+    uint8/int16/int32/float samples shaped (samples,) or (samples, channels).
+    The raw samples pass check_quality first.
+    """
+    audio = first_channel(np.asarray(audio))
+    check_quality(audio, sr)
+    audio = to_float(audio)
+    audio = preprocess(audio, sr, precision)
+    return fit_length(audio, TARGET_LENGTH)
+
+
+def features_from_array(audio, sr, feature_shape=None, precision=None):
+    """
+    Same as extract_features for audio already in memory: a NumPy array of
+    uint8/int16/int32/float samples, shaped (samples,) or (samples, channels)
+    """
+    return dwt_features(preprocessed_window(audio, sr, precision), feature_shape)
+
+
+def pcm_view(data, dtype='int16', channels=1):
+    """
+    Zero-copy view of raw interleaved PCM bytes (bytes, bytearray,
+    memoryview or any buffer) as a (samples,) or (samples, channels) array
+    """
+    if dtype not in PCM_DTYPES:
+        raise ValueError(f"Unsupported PCM dtype '{dtype}' (use one of: {', '.join(PCM_DTYPES)})")
+    audio = np.frombuffer(data, dtype=PCM_DTYPES[dtype])
+    if channels > 1:
+        if len(audio) % channels:
+            raise ValueError(f"PCM buffer holds {len(audio)} samples, not a multiple of {channels} channels")
+        audio = audio.reshape(-1, channels)
+    return audio
+
+
+def features_from_pcm(data, sr, dtype='int16', channels=1, feature_shape=None,
+                      precision=None):
+    """Same as extract_features for raw PCM bytes"""
+    return features_from_array(pcm_view(data, dtype, channels), sr, feature_shape, precision)
+
+
+def features_from_batch(recordings, feature_shape=None, precision=None):
+    """
+    Feature matrix (n, feature_shape) for a batch of in-memory recordings,
+    given as (audio, sr) pairs where audio is a NumPy array or PCM bytes
+    (bytes are read as mono int16; use pcm_view for other formats)
+    """
+    expected_features = feature_shape if feature_shape else DEFAULT_FEATURES
+    features = np.empty((len(recordings), expected_features), dtype=resolve_precision(precision))
+    for i, (audio, sr) in enumerate(recordings):
+        if isinstance(audio, (bytes, bytearray, memoryview)):
+            audio = pcm_view(audio)
+        features[i] = features_from_array(audio, sr, feature_shape, precision)[0]
+    return features
+
+
+def load_model(model_path=MODEL_PATH, quiet=True, n_jobs=None):
+    """
+    Load the pickled model. Returns a dict with 'classifier', 'scaler',
+    'label_encoder', 'feature_shape', 'accuracy', 'version' and 'lineage'
+    (missing parts are None; lineage is written by model_update.py).
+    quiet turns off sklearn's per-call progress output; pass n_jobs=1 in
+    pool workers, where parallelism comes from the pool.
+    """
+    with open(model_path, 'rb') as f:
+        model_data = pickle.load(f)
+
+    # Check if it's a dictionary with multiple components
+    if isinstance(model_data, dict):
+        model = {
+            'classifier': model_data.get('classifier'),
+            'scaler': model_data.get('scaler'),
+            'label_encoder': model_data.get('label_encoder'),
+            'feature_shape': model_data.get('feature_shape'),
+            'accuracy': model_data.get('accuracy'),
+            'version': model_data.get('version'),
+            'lineage': model_data.get('lineage'),
+        }
+    else:
+        # If it's just the model directly
+        model = {
+            'classifier': model_data,
+            'scaler': None,
+            'label_encoder': None,
+            'feature_shape': None,
+            'accuracy': None,
+            'version': None,
+            'lineage': None,
+        }
+
+    if quiet and hasattr(model['classifier'], 'verbose'):
+        model['classifier'].verbose = 0
+    if n_jobs is not None and hasattr(model['classifier'], 'n_jobs'):
+        model['classifier'].n_jobs = n_jobs
+    return model
+
+
+def dataset_files(interleave=False, limit=None):
+    """
+    Bundled recordings, sorted by class then name. With interleave=True the
+    classes alternate, so any prefix is class-balanced.
+    """
+    by_class = [sorted(p.glob("*.wav")) for p in sorted(DATASET_PATH.iterdir()) if p.is_dir()]
+    groups = zip(*by_class) if interleave else by_class
+    files = [f for group in groups for f in group]
+    return files[:limit] if limit else files
+
+
+def current_rss():
+    """Resident set size in bytes (None where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def file_sha256(path):
+    """Hex SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _scale(model, features):
+    if model['scaler'] is not None:
+        # Scale in float64 even for float32 features: float32 scaling flips
+        # borderline tree splits (the trees cast to float32 themselves)
+        features = model['scaler'].transform(np.asarray(features, dtype=np.float64))
+    return features
+
+
+def _decode(model, predictions):
+    """Decode labels if a label encoder is available"""
+    if model['label_encoder'] is not None:
+        predictions = model['label_encoder'].inverse_transform(predictions)
+    return predictions
+
+
+def predict(model, features):
+    """
+    Scale and classify feature rows of shape (n, feature_shape).
+    Returns a list of (label, confidence) tuples; confidence is a percentage
+    or None when the classifier has no predict_proba.
+    """
+    classifier = model['classifier']
+    features = _scale(model, features)
+
+    if hasattr(classifier, 'predict_proba'):
+        probabilities = classifier.predict_proba(features)
+        indices = np.argmax(probabilities, axis=1)
+        predictions = classifier.classes_[indices]
+        confidences = np.max(probabilities, axis=1) * 100
+    else:
+        predictions = classifier.predict(features)
+        confidences = [None] * len(predictions)
+
+    predictions = _decode(model, predictions)
+    return [(str(p), c) for p, c in zip(predictions, confidences)]
+
+
+def classify_array(model, audio, sr, precision=None):
+    """Classify one in-memory recording; returns (label, confidence)"""
+    return predict(model, features_from_array(audio, sr, model['feature_shape'], precision))[0]
+
+
+def classify_pcm(model, data, sr, dtype='int16', channels=1, precision=None):
+    """Classify raw PCM bytes; returns (label, confidence)"""
+    return classify_array(model, pcm_view(data, dtype, channels), sr, precision)
+
+
+def score_windows(model, windows):
+    """
+    Classify normalized (n, TARGET_LENGTH) windows of one recording with a
+    single forest call. Returns ([(label, confidence)] per window, combined
+    (label, confidence) from the mean class probabilities).
+    """
+    classifier = model['classifier']
+    scaled = _scale(model, dwt_features(windows, model['feature_shape']))
+    probabilities = classifier.predict_proba(scaled)
+    labels = _decode(model, classifier.classes_[np.argmax(probabilities, axis=1)])
+    per_window = [(str(label), float(100 * row.max()))
+                  for label, row in zip(labels, probabilities)]
+
+    combined = probabilities.mean(axis=0)
+    label = _decode(model, classifier.classes_[[np.argmax(combined)]])[0]
+    return per_window, (str(label), float(100 * combined.max()))
+
+
+def multichannel_windows(audio, sr, precision=None):
+    """
+    Normalized windows for every channel of (samples, channels) audio,
+    processed as one (channels, samples) array. Channels failing
+    check_quality are left out. Returns (windows (usable, TARGET_LENGTH),
+    usable channel indices, {channel: SignalQualityError}).
+    """
+    audio = np.asarray(audio)
+    if audio.ndim == 1:
+        audio = audio[:, np.newaxis]
+    rejected = {}
+    for channel in range(audio.shape[1]):
+        try:
+            check_quality(audio[:, channel], sr)
+        except SignalQualityError as e:
+            rejected[channel] = e
+    usable = [c for c in range(audio.shape[1]) if c not in rejected]
+    if not usable:
+        return np.empty((0, TARGET_LENGTH)), usable, rejected
+
+    # One contiguous (channels, samples) block so every stage runs once
+    audio = to_float(np.ascontiguousarray(audio[:, usable].T))
+    windows = fit_length(preprocess(audio, sr, precision), TARGET_LENGTH)
+    return windows, usable, rejected
+
+
+def classify_multichannel(model, audio, sr, precision=None):
+    """
+    Classify every channel (auscultation site) of one recording with a
+    single forest call. Returns a dict with per-site results under
+    'channels' (label, confidence or the rejection reason) and the
+    combined 'label'/'confidence' from the mean class probabilities of the
+    usable sites. Raises SignalQualityError if no channel is usable.
+    """
+    windows, usable, rejected = multichannel_windows(audio, sr, precision)
+    if not usable:
+        first = rejected[min(rejected)]
+        raise SignalQualityError(first.reason, f"No usable channel ({first})", first.metrics)
+
+    per_window, (label, confidence) = score_windows(model, windows)
+
+    channels = []
+    for channel in range(len(usable) + len(rejected)):
+        if channel in rejected:
+            channels.append({'channel': channel, 'label': None, 'confidence': None,
+                             'rejected': rejected[channel].reason})
+        else:
+            window_label, window_confidence = per_window[usable.index(channel)]
+            channels.append({'channel': channel, 'label': window_label,
+                             'confidence': window_confidence, 'rejected': None})
+    return {'label': label, 'confidence': confidence, 'channels': channels}
+
+
+def classify_multichannel_file(model, audio_path, precision=None):
+    """classify_multichannel for a WAV file"""
+    sr, audio = wavfile.read(audio_path)
+    return classify_multichannel(model, audio, sr, precision)
+
+
+def classify_batch(model, recordings, precision=None):
+    """
+    Classify a batch of (audio, sr) pairs with a single forest call.
+    Returns a list of (label, confidence) in input order.
+    """
+    if not recordings:
+        return []
+    return predict(model, features_from_batch(recordings, model['feature_shape'], precision))
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Indexed dataset catalog.
+Keeps a SQLite index of every recording under Yaseen_Khan/ and any added
+folders (laid out one sub-folder per class) with class, duration, sample
+rate, channels, size, hash and the cached prediction of the current model.
+Refreshes are incremental: only new or changed files are read, and
+predictions are recomputed only when the file or the model changes.
+
+Usage:
+    python3 dataset_catalog.py refresh [--add new_recordings/] [--predict]
+    python3 dataset_catalog.py list [--label MR] [--search 01] [--misclassified] [--paths]
+    python3 dataset_catalog.py stats
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from scipy.io import wavfile
+
+import audio_pipeline
+import hardware_probe
+
+REPO_ROOT = Path(__file__).parent
+DATASET_PATH = REPO_ROOT / "Yaseen_Khan"
+CATALOG_PATH = REPO_ROOT / "dataset_catalog.sqlite"
+REFRESH_BATCH = 50        # Files read and hashed per write transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (
+    path TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS recordings (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    label TEXT NOT NULL,
+    duration REAL,
+    sample_rate INTEGER,
+    channels INTEGER,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    prediction TEXT,
+    confidence REAL,
+    quality TEXT,
+    model_sha256 TEXT,
+    indexed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recordings_label ON recordings (label);
+CREATE INDEX IF NOT EXISTS recordings_prediction ON recordings (prediction);
+"""
+
+
+def catalog_path_for(path):
+    """Stored path: relative to the repo when inside it, absolute otherwise"""
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(REPO_ROOT.resolve()).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def resolve(stored_path):
+    """Filesystem path for a stored catalog path"""
+    path = Path(stored_path)
+    return path if path.is_absolute() else REPO_ROOT / path
+
+
+class DatasetCatalog:
+    """SQLite index of labelled recordings"""
+
+    def __init__(self, catalog_path=CATALOG_PATH):
+        self.db = sqlite3.connect(str(catalog_path))
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        self.db.execute("INSERT OR IGNORE INTO roots VALUES (?)",
+                        (catalog_path_for(DATASET_PATH),))
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def add_root(self, directory):
+        """Index another folder of <label>/*.wav recordings from now on"""
+        self.db.execute("INSERT OR IGNORE INTO roots VALUES (?)", (catalog_path_for(directory),))
+        self.db.commit()
+
+    def roots(self):
+        return [row['path'] for row in self.db.execute("SELECT path FROM roots ORDER BY path")]
+
+    def refresh(self):
+        """
+        Bring the index in line with the filesystem: new and changed files
+        are read and hashed, unchanged files only stat'ed, vanished files
+        removed. Returns (added, updated, removed) counts.
+        """
+        known = {row['path']: (row['size'], row['mtime_ns'])
+                 for row in self.db.execute("SELECT path, size, mtime_ns FROM recordings")}
+        seen = set()
+        added = updated = 0
+        rows = []
+        for root in self.roots():
+            for wav_path in sorted(resolve(root).glob("*/*.wav")):
+                stored = catalog_path_for(wav_path)
+                seen.add(stored)
+                stat = wav_path.stat()
+                if known.get(stored) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                # Read and hash outside any transaction; write in short batches
+                # so other connections (the GUI) are never locked out for long
+                rows.append(self._metadata(wav_path, stored, root, stat))
+                if len(rows) >= REFRESH_BATCH:
+                    self._write_metadata(rows)
+                    rows = []
+                if stored in known:
+                    updated += 1
+                else:
+                    added += 1
+        self._write_metadata(rows)
+        removed = set(known) - seen
+        self.db.executemany("DELETE FROM recordings WHERE path = ?", [(p,) for p in removed])
+        self.db.commit()
+        return added, updated, len(removed)
+
+    @staticmethod
+    def _metadata(wav_path, stored, root, stat):
+        """Read one file's metadata and hash as a recordings row"""
+        try:
+            sr, audio = wavfile.read(wav_path, mmap=True)
+            duration = len(audio) / sr
+            channels = audio.shape[1] if audio.ndim > 1 else 1
+            del audio
+        except Exception:
+            sr = duration = channels = None
+        return (stored, root, wav_path.parent.name, duration, sr, channels, stat.st_size,
+                stat.st_mtime_ns, audio_pipeline.file_sha256(wav_path),
+                datetime.now().isoformat(timespec='seconds'))
+
+    def _write_metadata(self, rows):
+        """(Re)index rows from _metadata in one transaction; clears cached predictions"""
+        if not rows:
+            return
+        self.db.executemany(
+            "INSERT OR REPLACE INTO recordings (path, root, label, duration, sample_rate, "
+            "channels, size, mtime_ns, sha256, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows)
+        self.db.commit()
+
+    def store_prediction(self, path, prediction, confidence, model_sha256, quality='ok'):
+        """Cache one result (prediction None with a quality reason if rejected)"""
+        self.db.execute(
+            "UPDATE recordings SET prediction = ?, confidence = ?, quality = ?, model_sha256 = ? "
+            "WHERE path = ?",
+            (prediction, confidence, quality, model_sha256, catalog_path_for(path)))
+        self.db.commit()
+
+    def refresh_predictions(self, model, model_sha256, batch_size=None):
+        """
+        Classify every recording without a prediction from this model, in
+        forest batches of `batch_size` (default: tuning profile); returns the count
+        """
+        batch_size = batch_size or hardware_probe.load_tuning_profile()['batch_size']
+        stale = [row['path'] for row in self.db.execute(
+            "SELECT path FROM recordings WHERE model_sha256 IS NULL OR model_sha256 != ?",
+            (model_sha256,))]
+        for first in range(0, len(stale), batch_size):
+            paths, rows, results = [], [], []
+            for stored in stale[first:first + batch_size]:
+                try:
+                    rows.append(audio_pipeline.extract_features(str(resolve(stored)),
+                                                                model['feature_shape']))
+                    paths.append(stored)
+                except audio_pipeline.SignalQualityError as e:
+                    results.append((None, None, e.reason, model_sha256, stored))
+                except Exception:
+                    results.append((None, None, 'error', model_sha256, stored))
+            if rows:
+                predictions = audio_pipeline.predict(model, np.vstack(rows))
+                results += [(label, None if confidence is None else float(confidence), 'ok',
+                             model_sha256, stored)
+                            for stored, (label, confidence) in zip(paths, predictions)]
+            self.db.executemany(
+                "UPDATE recordings SET prediction = ?, confidence = ?, quality = ?, "
+                "model_sha256 = ? WHERE path = ?", results)
+            self.db.commit()
+        return len(stale)
+
+    def query(self, label=None, search=None, misclassified=False, root=None, limit=None):
+        """Matching recordings (sqlite3.Row) ordered by path"""
+        clauses, params = [], []
+        if label:
+            clauses.append("label = ?")
+            params.append(label)
+        if search:
+            clauses.append("path LIKE ?")
+            params.append(f"%{search}%")
+        if misclassified:
+            clauses.append("prediction IS NOT NULL AND prediction != label")
+        if root:
+            clauses.append("root = ?")
+            params.append(catalog_path_for(root))
+        sql = "SELECT * FROM recordings"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY path"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self.db.execute(sql, params).fetchall()
+
+    def stats(self):
+        """Per-class counts, predicted counts, misclassified counts and durations"""
+        return self.db.execute(
+            "SELECT label, COUNT(*) AS files, COUNT(prediction) AS predicted, "
+            "SUM(prediction IS NOT NULL AND prediction != label) AS misclassified, "
+            "SUM(quality IS NOT NULL AND quality NOT IN ('ok')) AS rejected, "
+            "AVG(duration) AS mean_duration FROM recordings GROUP BY label ORDER BY label"
+        ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index, search and filter the recordings")
+    parser.add_argument('--catalog', type=Path, default=CATALOG_PATH,
+                        help="SQLite catalog path (default: %(default)s)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    refresh = commands.add_parser('refresh', help="Update the index incrementally")
+    refresh.add_argument('--add', type=Path, action='append', default=[],
+                         help="Also index this folder of <label>/*.wav (repeatable)")
+    refresh.add_argument('--predict', action='store_true',
+                         help="Cache predictions of the current model for stale entries")
+
+    listing = commands.add_parser('list', help="List matching recordings")
+    listing.add_argument('--label', help="Only this class")
+    listing.add_argument('--search', help="Substring of the path")
+    listing.add_argument('--misclassified', action='store_true',
+                         help="Only recordings whose cached prediction is wrong")
+    listing.add_argument('--limit', type=int, default=None)
+    listing.add_argument('--paths', action='store_true',
+                         help="Print only file paths (for piping into other tools)")
+
+    commands.add_parser('stats', help="Per-class summary")
+    args = parser.parse_args()
+
+    catalog = DatasetCatalog(args.catalog)
+    if args.command == 'refresh':
+        for directory in args.add:
+            if not directory.is_dir():
+                print(f"✗ Not a directory: {directory}")
+                sys.exit(1)
+            catalog.add_root(directory)
+        start = time.perf_counter()
+        added, updated, removed = catalog.refresh()
+        print(f"✓ Index: {added} added, {updated} updated, {removed} removed "
+              f"({time.perf_counter() - start:.2f}s)")
+        if args.predict:
+            warnings.filterwarnings('ignore')
+            model = audio_pipeline.load_model()
+            start = time.perf_counter()
+            model_sha256 = audio_pipeline.file_sha256(audio_pipeline.MODEL_PATH)
+            count = catalog.refresh_predictions(model, model_sha256)
+            print(f"✓ Predictions: {count} computed ({time.perf_counter() - start:.2f}s)")
+
+    elif args.command == 'list':
+        rows = catalog.query(args.label, args.search, args.misclassified, limit=args.limit)
+        if args.paths:
+            for row in rows:
+                print(resolve(row['path']))
+        else:
+            print(f"{'File':<38} {'Class':<5} {'Pred':<5} {'Conf':>6} {'Dur s':>6} {'Hz':>6}")
+            print("-" * 70)
+            for row in rows:
+                confidence = f"{row['confidence']:.1f}%" if row['confidence'] is not None else ''
+                prediction = row['prediction'] or (row['quality'] or '')[:5]
+                print(f"{row['path'][-38:]:<38} {row['label']:<5} {prediction:<5} "
+                      f"{confidence:>6} {row['duration'] or 0:>6.2f} {row['sample_rate'] or 0:>6}")
+            print(f"\n{len(rows)} recordings")
+
+    else:
+        print(f"{'Class':<6} {'Files':>6} {'Predicted':>10} {'Wrong':>6} {'Rejected':>9} {'Mean s':>7}")
+        print("-" * 50)
+        for row in catalog.stats():
+            print(f"{row['label']:<6} {row['files']:>6} {row['predicted']:>10} "
+                  f"{row['misclassified'] or 0:>6} {row['rejected'] or 0:>9} "
+                  f"{row['mean_duration'] or 0:>7.2f}")
+    catalog.close()
+
+
+if __name__ == "__main__":
+    main()
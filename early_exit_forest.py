@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Early-exit Random Forest inference with vote-margin stopping.
+Trees are evaluated in chunks; after each chunk the leading class's
+accumulated probability mass is compared with the runner-up. Once the gap
+exceeds what the remaining trees could possibly add to the runner-up, the
+full forest's answer is already decided and evaluation stops.
+
+Usage (measure latency savings on the bundled dataset):
+    python3 early_exit_forest.py [--chunk 10] [--slack 0.0] [--every 1]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+import audio_pipeline
+
+CHUNK_SIZE = 10     # Trees evaluated between stopping checks
+MIN_TREES = 10      # Never stop before this many trees have voted
+SLACK = 0.0         # 0 = exact (same label as the full forest); up to 1 = stop sooner
+
+
+def predict_early_exit(model, features, chunk_size=CHUNK_SIZE, slack=SLACK,
+                       min_trees=MIN_TREES, max_trees=None):
+    """
+    Classify feature rows (n, feature_shape) with early exit.
+
+    Stops once, for every row, the leader's mass minus the runner-up's
+    exceeds (1 - slack) * remaining_trees. With slack=0 the label is
+    guaranteed to equal the full forest's. max_trees caps the trees
+    evaluated (a fixed tree subset, which gives up that guarantee).
+    Returns one dict per row with
+    'label', 'confidence' (mean leader probability over the trees used, %),
+    'confidence_range' (the full-forest confidence can only fall in this
+    interval, %), 'margin' (leader minus runner-up votes when evaluation
+    stopped) and 'trees_used'.
+    """
+    classifier = model['classifier']
+    if model['scaler'] is not None:
+        features = model['scaler'].transform(np.asarray(features, dtype=np.float64))
+    # Trees compare float32 features; convert once instead of once per tree
+    features = np.ascontiguousarray(features, dtype=np.float32)
+
+    estimators = classifier.estimators_
+    n_trees = len(estimators)
+    limit = min(max_trees, n_trees) if max_trees else n_trees
+    mass = np.zeros((len(features), len(classifier.classes_)))
+    used = 0
+    while used < limit:
+        for tree in estimators[used:min(used + chunk_size, limit)]:
+            mass += tree.predict_proba(features, check_input=False)
+        used = min(used + chunk_size, limit)
+        if used < min_trees:
+            continue
+
+        remaining = n_trees - used
+        top_two = np.sort(mass, axis=1)[:, -2:]
+        if np.all(top_two[:, 1] - top_two[:, 0] > (1 - slack) * remaining):
+            break
+
+    indices = np.argmax(mass, axis=1)
+    labels = classifier.classes_[indices]
+    if model['label_encoder'] is not None:
+        labels = model['label_encoder'].inverse_transform(labels)
+
+    remaining = n_trees - used
+    top_two = np.sort(mass, axis=1)[:, -2:]
+    results = []
+    for row, (label, index) in enumerate(zip(labels, indices)):
+        leader = mass[row, index]
+        results.append({
+            'label': str(label),
+            'confidence': 100 * leader / used,
+            'confidence_range': (100 * leader / n_trees, 100 * (leader + remaining) / n_trees),
+            'margin': float(top_two[row, 1] - top_two[row, 0]),
+            'trees_used': used,
+        })
+    return results
+
+
+def main():
+    from golden_features import DATASET_PATH, dataset_files, load_quiet_model
+
+    parser = argparse.ArgumentParser(description="Measure early-exit inference on the dataset")
+    parser.add_argument('--chunk', type=int, default=CHUNK_SIZE,
+                        help="Trees per stopping check (default: %(default)s)")
+    parser.add_argument('--slack', type=float, default=SLACK,
+                        help="0 = exact, larger stops sooner (default: %(default)s)")
+    parser.add_argument('--min-trees', type=int, default=MIN_TREES,
+                        help="Minimum trees before stopping (default: %(default)s)")
+    parser.add_argument('--every', type=int, default=1,
+                        help="Use every Nth bundled file (default: %(default)s)")
+    args = parser.parse_args()
+
+    model = load_quiet_model()
+    root = DATASET_PATH.parent
+    names = dataset_files()[::args.every]
+    rows = [audio_pipeline.extract_features(str(root / name), model['feature_shape'])
+            for name in names]
+
+    n_trees = len(model['classifier'].estimators_)
+    full_times, all_tree_times, early_times = [], [], []
+    trees, agree, conf_error = [], [], []
+    for features in rows:
+        start = time.perf_counter()
+        full_label, full_confidence = audio_pipeline.predict(model, features)[0]
+        full_times.append(time.perf_counter() - start)
+
+        # Same per-tree loop without stopping, to separate the savings from
+        # early exit from those of skipping sklearn's parallel dispatch
+        start = time.perf_counter()
+        predict_early_exit(model, features, n_trees, min_trees=n_trees)
+        all_tree_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        result = predict_early_exit(model, features, args.chunk, args.slack, args.min_trees)[0]
+        early_times.append(time.perf_counter() - start)
+
+        trees.append(result['trees_used'])
+        agree.append(result['label'] == full_label)
+        conf_error.append(abs(result['confidence'] - full_confidence))
+
+    full_times, all_tree_times, early_times, trees = map(
+        np.array, (full_times, all_tree_times, early_times, trees))
+    print("=" * 60)
+    print(f"EARLY-EXIT INFERENCE ({len(rows)} files, chunk={args.chunk}, slack={args.slack})")
+    print("=" * 60)
+    print(f"Trees used:            mean {trees.mean():.1f} / {n_trees}, "
+          f"median {np.median(trees):.0f}, max {trees.max()}")
+    print(f"Full forest latency:   median {1000 * np.median(full_times):.2f} ms, "
+          f"p95 {1000 * np.percentile(full_times, 95):.2f} ms")
+    print(f"All trees, no exit:    median {1000 * np.median(all_tree_times):.2f} ms, "
+          f"p95 {1000 * np.percentile(all_tree_times, 95):.2f} ms")
+    print(f"Early-exit latency:    median {1000 * np.median(early_times):.2f} ms, "
+          f"p95 {1000 * np.percentile(early_times, 95):.2f} ms")
+    print(f"Speed-up (median):     {np.median(full_times) / np.median(early_times):.2f}x vs full, "
+          f"{np.median(all_tree_times) / np.median(early_times):.2f}x vs all trees")
+    print(f"Label agreement:       {100 * np.mean(agree):.2f}%")
+    print(f"Confidence difference: mean {np.mean(conf_error):.1f}, max {np.max(conf_error):.1f} points")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Multi-node batch classification across a fleet of devices.
+A coordinator splits a manifest of recordings into shards and hands them
+out over TCP to workers on other hosts, which run the same
+extract_features + model pipeline as the hot-folder service. Workers pull
+shards as they go idle. Once the queue is empty, an idle worker steals a
+speculative copy of the oldest running shard. Shards whose worker
+disconnects or overruns its lease are retried, and the first result for
+each file wins (later duplicates are dropped). Results go to the same CSV
+log as hot_folder_service.py, so a restarted coordinator skips files that
+are already done.
+
+Usage:
+    python3 fleet_batch.py coordinator manifest.txt --port 5557 [--results fleet_results.csv]
+    python3 fleet_batch.py worker --host pi-01.local --port 5557 [--processes 4]
+    python3 fleet_batch.py local manifest.txt --workers 3     # everything on localhost
+
+A manifest lists one recording per line (e.g. from
+`dataset_catalog.py list --paths`). Workers resolve relative paths
+against --root, so every host needs the archive at the same place (or a
+shared mount).
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import audio_pipeline
+import hardware_probe
+import hot_folder_service
+
+DEFAULT_PORT = 5557
+SHARD_SIZE = 16             # Files per shard
+LEASE_SECONDS = 300.0       # A shard not reported within this is retried
+MAX_ATTEMPTS = 3            # Leases per shard before its files are marked failed
+PROGRESS_SECONDS = 5.0
+WAIT_SECONDS = 1.0          # Worker back-off while all shards are leased
+CONNECT_SECONDS = 30.0      # How long a worker keeps trying to reach the coordinator
+
+# Result columns a worker may report (file identity comes from the shard)
+RESULT_FIELDS = ['status', 'prediction', 'confidence', 'seconds', 'error']
+
+
+def send(stream, message):
+    """Write one newline-delimited JSON message"""
+    stream.write((json.dumps(message) + '\n').encode())
+    stream.flush()
+
+
+def receive(stream):
+    """Read one newline-delimited JSON message"""
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("Connection closed")
+    return json.loads(line)
+
+
+def read_manifest(manifest_path):
+    """Recording paths from a manifest, without blanks, comments or repeats"""
+    with open(manifest_path) as f:
+        entries = (line.strip() for line in f)
+        return list(dict.fromkeys(e for e in entries if e and not e.startswith('#')))
+
+
+class Shard:
+    """A slice of the manifest and the workers currently holding it"""
+
+    def __init__(self, shard_id, files):
+        self.id = shard_id
+        self.files = files
+        self.attempts = 0
+        self.leases = {}    # worker -> lease start (time.monotonic)
+        self.done = False
+
+
+class Coordinator:
+    """Shard queue, leases, deduplicated results and progress counters"""
+
+    def __init__(self, files, results_path, shard_size=SHARD_SIZE, token=None,
+                 model_sha256=None, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        results_path = Path(results_path)
+        already = {key[0] for key in hot_folder_service.load_ledger(results_path)}
+        self.done_files = set(f for f in files if f in already)
+        todo = [f for f in files if f not in already]
+        self.total = len(files)
+        self.skipped = len(self.done_files)
+        self.shards = {i: Shard(i, todo[start:start + shard_size])
+                       for i, start in enumerate(range(0, len(todo), shard_size))}
+        self.pending = deque(self.shards.values())
+        self.in_flight = {}
+        self.token = token
+        self.model_sha256 = model_sha256
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.log = hot_folder_service.ResultLog(results_path)
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.started = time.monotonic()
+        self.counts = {'retries': 0, 'stolen': 0, 'duplicates': 0, 'failed': 0}
+        self.per_worker = {}
+        self.connected = set()
+        self._check_finished()
+
+    def register(self, name):
+        """Unique worker id for a new connection (same-named workers get a suffix)"""
+        with self.lock:
+            worker, n = name, 1
+            while worker in self.connected:
+                n += 1
+                worker = f"{name}#{n}"
+            self.connected.add(worker)
+            return worker
+
+    def next_shard(self, worker):
+        """A shard for `worker`, None to wait, or raises StopIteration when finished"""
+        with self.lock:
+            self._expire_leases()
+            if self.finished.is_set():
+                raise StopIteration
+            while self.pending:
+                shard = self.pending.popleft()
+                if shard.done:
+                    continue  # Reported by an earlier lease after being requeued
+                shard.attempts += 1
+                shard.leases[worker] = time.monotonic()
+                self.in_flight[shard.id] = shard
+                return shard
+
+            # Work stealing: duplicate the longest-running shard this worker
+            # is not already on; whichever copy finishes first wins
+            candidates = [s for s in self.in_flight.values()
+                          if worker not in s.leases and len(s.leases) < 2]
+            if candidates:
+                shard = min(candidates, key=lambda s: min(s.leases.values()))
+                shard.leases[worker] = time.monotonic()
+                self.counts['stolen'] += 1
+                return shard
+            return None
+
+    def complete(self, worker, shard_id, results):
+        """
+        Record a shard's results; files that already have one are dropped.
+        Raises ValueError for an unknown shard or a file outside it.
+        """
+        with self.lock:
+            shard = self.shards.get(shard_id)
+            if shard is None:
+                raise ValueError(f"Unknown shard {shard_id!r}")
+            files = set(shard.files)
+            if any(result.get('file') not in files for result in results):
+                raise ValueError(f"Result for a file outside shard {shard_id}")
+            for result in results:
+                name = result['file']
+                if name in self.done_files:
+                    self.counts['duplicates'] += 1
+                    continue
+                row = {field: result.get(field, '') for field in RESULT_FIELDS}
+                self.log.append((name, int(result.get('size', 0)),
+                                 int(result.get('mtime_ns', 0))), row)
+                self.done_files.add(name)
+                self.per_worker[worker] = self.per_worker.get(worker, 0) + 1
+
+            if files <= self.done_files:
+                # Also covers a late result for a shard requeued after its
+                # lease expired: the queued copy is skipped by next_shard
+                shard.done = True
+                shard.leases.clear()
+                self.in_flight.pop(shard_id, None)
+            elif worker in shard.leases:
+                # Incomplete report: give the rest to another lease
+                del shard.leases[worker]
+                if shard.id in self.in_flight:
+                    self._requeue_if_orphaned(shard)
+            self._check_finished()
+
+    def release(self, worker):
+        """Worker disconnected: give up its leases"""
+        with self.lock:
+            self.connected.discard(worker)
+            for shard in list(self.in_flight.values()):
+                if worker in shard.leases:
+                    del shard.leases[worker]
+                    self._requeue_if_orphaned(shard)
+            self._check_finished()
+
+    def _expire_leases(self):
+        now = time.monotonic()
+        for shard in list(self.in_flight.values()):
+            for worker, start in list(shard.leases.items()):
+                if now - start > self.lease_seconds:
+                    del shard.leases[worker]
+            self._requeue_if_orphaned(shard)
+        self._check_finished()
+
+    def _requeue_if_orphaned(self, shard):
+        """Retry a shard nobody holds any more, or fail it after MAX_ATTEMPTS"""
+        if shard.leases or shard.done:
+            return
+        del self.in_flight[shard.id]
+        if shard.attempts < self.max_attempts:
+            self.counts['retries'] += 1
+            self.pending.appendleft(shard)
+            return
+        shard.done = True
+        self.counts['failed'] += 1
+        for name in shard.files:
+            if name not in self.done_files:
+                self.log.append((name, 0, 0), {
+                    'status': 'failed', 'prediction': '', 'confidence': '', 'seconds': '',
+                    'error': f"Shard failed after {shard.attempts} attempts"})
+                self.done_files.add(name)
+
+    def _check_finished(self):
+        if len(self.done_files) >= self.total:
+            self.finished.set()
+
+    def progress(self):
+        """One-line progress summary"""
+        with self.lock:
+            done = len(self.done_files) - self.skipped
+            remaining = self.total - len(self.done_files)
+            elapsed = time.monotonic() - self.started
+            rate = done / elapsed if elapsed > 0 else 0.0
+            eta = f"{remaining / rate:.0f}s" if rate > 0 else "-"
+            workers = " ".join(f"{w}={n}" for w, n in sorted(self.per_worker.items()))
+            return (f"[{elapsed:6.1f}s] {len(self.done_files)}/{self.total} files "
+                    f"({rate:.1f}/s, ETA {eta}) | in flight {len(self.in_flight)} shards | "
+                    f"retries {self.counts['retries']}, stolen {self.counts['stolen']}, "
+                    f"duplicates {self.counts['duplicates']}, failed {self.counts['failed']}"
+                    + (f" | {workers}" if workers else ""))
+
+
+class CoordinatorHandler(socketserver.StreamRequestHandler):
+    """One worker connection"""
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        worker = None
+        try:
+            hello = receive(self.rfile)
+            if coordinator.token and hello.get('token') != coordinator.token:
+                send(self.wfile, {'type': 'error', 'error': "Bad token"})
+                return
+            if (coordinator.model_sha256 and hello.get('model_sha256')
+                    and hello['model_sha256'] != coordinator.model_sha256):
+                send(self.wfile, {'type': 'error', 'error': "Model differs from the coordinator's"})
+                return
+            worker = coordinator.register(f"{hello.get('worker', 'worker')}@{self.client_address[0]}")
+            send(self.wfile, {'type': 'welcome'})
+            while True:
+                message = receive(self.rfile)
+                if message['type'] == 'result':
+                    try:
+                        coordinator.complete(worker, message['shard_id'], message['results'])
+                    except ValueError as e:
+                        print(f"⚠ Dropping {worker}: {e}", flush=True)
+                        send(self.wfile, {'type': 'error', 'error': str(e)})
+                        return
+                    continue
+                try:
+                    shard = coordinator.next_shard(worker)
+                except StopIteration:
+                    send(self.wfile, {'type': 'done'})
+                    return
+                if shard is None:
+                    send(self.wfile, {'type': 'wait', 'seconds': WAIT_SECONDS})
+                else:
+                    send(self.wfile, {'type': 'shard', 'shard_id': shard.id,
+                                      'files': shard.files, 'attempt': shard.attempts})
+        except (ConnectionError, OSError, ValueError, KeyError):
+            pass
+        finally:
+            if worker:
+                coordinator.release(worker)
+
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, coordinator):
+        super().__init__(address, CoordinatorHandler)
+        self.coordinator = coordinator
+
+
+def run_coordinator(coordinator, host, port, ready=None):
+    """Serve until every file has a result; prints progress"""
+    with CoordinatorServer((host, port), coordinator) as server:
+        if ready is not None:
+            ready(server.server_address[1])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        while not coordinator.finished.wait(PROGRESS_SECONDS):
+            print(coordinator.progress(), flush=True)
+        print(coordinator.progress(), flush=True)
+        server.shutdown()
+    coordinator.log.close()
+
+
+def _classify_entry(entry):
+    """Worker-process task: classify one manifest entry, never raising"""
+    name, path = entry
+    try:
+        stat = os.stat(path)
+        size, mtime_ns = stat.st_size, stat.st_mtime_ns
+    except OSError:
+        size = mtime_ns = 0
+    result = hot_folder_service._classify_file(path)
+    result.update({'file': name, 'size': size, 'mtime_ns': mtime_ns})
+    return result
+
+
+def connect(host, port, timeout=CONNECT_SECONDS):
+    """Connect, retrying while the coordinator starts up"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return socket.create_connection((host, port), timeout=10)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+def run_worker(host, port, name, processes, root, token=None,
+               model_path=audio_pipeline.MODEL_PATH, crash_after=None):
+    """Pull shards until the coordinator says done; returns files classified (None if rejected)"""
+    root = Path(root)
+    classified = shards = 0
+    with ProcessPoolExecutor(max_workers=processes,
+                             initializer=hot_folder_service._init_worker,
+                             initargs=(model_path,)) as pool:
+        # Start the pool (and load the model) before connecting, so no shard
+        # is leased during model load and forked children never inherit the
+        # socket (which would keep a crashed worker's connection open)
+        pool.submit(os.getpid).result()
+        sock = connect(host, port)
+        sock.settimeout(None)
+        stream = sock.makefile('rwb')
+        try:
+            send(stream, {'type': 'hello', 'worker': name, 'token': token,
+                          'model_sha256': audio_pipeline.file_sha256(model_path)})
+            reply = receive(stream)
+            if reply['type'] == 'error':
+                print(f"✗ Rejected by coordinator: {reply['error']}")
+                return None
+            while True:
+                send(stream, {'type': 'request'})
+                message = receive(stream)
+                if message['type'] == 'done':
+                    break
+                if message['type'] == 'wait':
+                    time.sleep(message['seconds'])
+                    continue
+                entries = [(f, str(root / f)) for f in message['files']]
+                results = list(pool.map(_classify_entry, entries))
+                if crash_after is not None and shards >= crash_after:
+                    # Fault injection for testing: drop the connection holding a shard
+                    raise SystemExit(3)
+                send(stream, {'type': 'result', 'shard_id': message['shard_id'],
+                              'results': results})
+                classified += len(results)
+                shards += 1
+        except ConnectionError:
+            pass  # Coordinator finished and closed while we were working
+        finally:
+            sock.close()
+    return classified
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch classification across several hosts")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    coordinator = commands.add_parser('coordinator', help="Hand out shards of a manifest")
+    local = commands.add_parser('local', help="Coordinator plus N workers on localhost")
+    for sub in (coordinator, local):
+        sub.add_argument('manifest', type=Path, help="File with one recording path per line")
+        sub.add_argument('--results', type=Path, default=Path("fleet_results.csv"),
+                         help="Results CSV, also the resume ledger (default: %(default)s)")
+        sub.add_argument('--shard-size', type=int, default=SHARD_SIZE,
+                         help="Files per shard (default: %(default)s)")
+        sub.add_argument('--lease', type=float, default=LEASE_SECONDS,
+                         help="Seconds before an unreported shard is retried (default: %(default)s)")
+    coordinator.add_argument('--host', default='0.0.0.0', help="Listen address (default: %(default)s)")
+    coordinator.add_argument('--port', type=int, default=DEFAULT_PORT)
+    coordinator.add_argument('--token', default=None, help="Shared secret workers must send")
+    local.add_argument('--workers', type=int, default=2, help="Worker processes to start")
+    local.add_argument('--crash-after', type=int, default=None,
+                       help="Make the first worker die holding a shard after N shards")
+
+    worker = commands.add_parser('worker', help="Classify shards from a coordinator")
+    worker.add_argument('--host', default='127.0.0.1', help="Coordinator address")
+    worker.add_argument('--port', type=int, default=DEFAULT_PORT)
+    worker.add_argument('--name', default=socket.gethostname(), help="Worker name in reports")
+    worker.add_argument('--processes', type=int, default=None,
+                        help="Local worker processes (default: from tuning_profile.json)")
+    worker.add_argument('--root', type=Path, default=Path(__file__).parent,
+                        help="Directory relative manifest paths are under (default: repo)")
+    worker.add_argument('--token', default=None)
+    worker.add_argument('--crash-after', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        processes = args.processes or hardware_probe.load_tuning_profile()['workers']
+        count = run_worker(args.host, args.port, args.name, processes, args.root,
+                           args.token, crash_after=args.crash_after)
+        if count is None:
+            sys.exit(1)
+        print(f"✓ {args.name}: {count} files classified")
+        return
+
+    files = read_manifest(args.manifest)
+    model_sha256 = (audio_pipeline.file_sha256(audio_pipeline.MODEL_PATH)
+                    if audio_pipeline.MODEL_PATH.exists() else None)
+    state = Coordinator(files, args.results, args.shard_size,
+                        getattr(args, 'token', None), model_sha256, args.lease)
+    print("=" * 60)
+    print(f"FLEET BATCH: {state.total} files, {state.skipped} already done, "
+          f"{len(state.pending)} shards of {args.shard_size}")
+    print("=" * 60)
+
+    if args.command == 'coordinator':
+        print(f"Listening on {args.host}:{args.port}")
+        if not args.token and args.host not in ('127.0.0.1', 'localhost', '::1'):
+            print("⚠ No --token: any host that can reach this port can act as a worker")
+        run_coordinator(state, args.host, args.port)
+    else:
+        workers = []
+
+        def start_workers(port):
+            print(f"Listening on 127.0.0.1:{port}, starting {args.workers} workers")
+            for i in range(args.workers):
+                command = [sys.executable, str(Path(__file__).resolve()), 'worker',
+                           '--port', str(port), '--name', f"local{i}", '--processes', '1']
+                if i == 0 and args.crash_after is not None:
+                    command += ['--crash-after', str(args.crash_after)]
+                workers.append(subprocess.Popen(command, stdout=subprocess.DEVNULL,
+                                                stderr=subprocess.DEVNULL))
+
+        run_coordinator(state, '127.0.0.1', 0, ready=start_workers)
+        for process in workers:
+            process.wait()
+
+    counts = state.counts
+    print(f"\n✓ Results: {args.results} "
+          f"({counts['retries']} retries, {counts['stolen']} stolen, "
+          f"{counts['duplicates']} duplicates dropped, {counts['failed']} shards failed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Golden-feature equivalence harness.
+golden_reference.npz holds the DWT features, scaled features and class
+probabilities that the reference pipeline (audio_pipeline.extract_features +
+the pickled scaler and forest) produces for every bundled Yaseen_Khan file.
+Any alternative feature pipeline or inference engine is checked against it
+stage by stage, and the worst-offending files are reported. Engines that
+stop early (early_exit_forest) give no full probabilities; they are checked
+on labels and on their vote margin instead.
+
+Usage:
+    python3 golden_features.py --generate                # rebuild the reference
+    python3 golden_features.py                           # check every engine
+    python3 golden_features.py --pipeline NAME --engine NAME [--every 5]
+"""
+
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+import audio_pipeline
+import early_exit_forest
+
+GOLDEN_PATH = Path(__file__).parent / "golden_reference.npz"
+DATASET_PATH = audio_pipeline.DATASET_PATH
+WORST_FILES = 5
+
+# Per-stage tolerances as (max absolute error, max relative error vs the
+# stage's largest reference magnitude)
+TOLERANCES = {
+    'features': (1e-4, 1e-5),
+    'scaled': (1e-3, 1e-5),
+    'probabilities': (0.02, None),
+    'vote margin': (1e-6, None),   # Votes beyond what the skipped trees explain
+}
+MIN_LABEL_AGREEMENT = 1.0
+
+# Alternative feature pipelines: name -> callable(path, feature_shape) -> (1, n)
+PIPELINES = {
+    'reference': audio_pipeline.extract_features,
+    'float32': lambda path, feature_shape: audio_pipeline.extract_features(
+        path, feature_shape, precision='float32'),
+}
+
+# Alternative inference engines: name -> callable(model, scaled) -> (n, classes)
+ENGINES = {
+    'reference': lambda model, scaled: model['classifier'].predict_proba(scaled),
+}
+
+# Early-stopping engines: name -> callable(model, scaled) -> predict_early_exit dicts
+DECISION_ENGINES = {
+    'early_exit': lambda model, scaled: early_exit_forest.predict_early_exit(
+        dict(model, scaler=None), scaled),
+}
+
+
+def dataset_files():
+    """Every bundled recording, relative to the repo root, in a stable order"""
+    return [p.relative_to(DATASET_PATH.parent).as_posix() for p in audio_pipeline.dataset_files()]
+
+
+def load_quiet_model():
+    """Load the model with sklearn's unpickling warnings silenced"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model = audio_pipeline.load_model()
+    return model
+
+
+def run_pipeline(model, files, pipeline, engine):
+    """Features, scaled features and probabilities for `files`"""
+    root = DATASET_PATH.parent
+    feature_shape = model['feature_shape']
+    features = np.empty((len(files), feature_shape or audio_pipeline.DEFAULT_FEATURES))
+    for i, name in enumerate(files):
+        features[i] = pipeline(str(root / name), feature_shape)[0]
+    scaled = model['scaler'].transform(features) if model['scaler'] is not None else features
+    probabilities = engine(model, scaled)
+    return features, scaled, probabilities
+
+
+def generate(golden_path=GOLDEN_PATH):
+    """Write the reference dump from the current reference implementation"""
+    model = load_quiet_model()
+    files = dataset_files()
+    start = time.perf_counter()
+    features, scaled, probabilities = run_pipeline(
+        model, files, PIPELINES['reference'], ENGINES['reference']
+    )
+    np.savez_compressed(
+        golden_path,
+        files=np.array(files),
+        features=features.astype(np.float32),
+        scaled=scaled.astype(np.float32),
+        probabilities=probabilities,
+        classes=np.asarray(model['classifier'].classes_),
+    )
+    print(f"✓ Reference for {len(files)} files written to {golden_path} "
+          f"({time.perf_counter() - start:.1f}s)")
+
+
+def compare_stage(name, reference, candidate, files):
+    """Error statistics for one stage plus its worst-offending files"""
+    diff = np.abs(candidate - reference)
+    per_file = diff.max(axis=1)
+    scale = np.abs(reference).max()
+    max_abs = float(per_file.max()) if len(per_file) else 0.0
+    max_rel = max_abs / scale if scale > 0 else 0.0
+
+    abs_tol, rel_tol = TOLERANCES[name]
+    passed = max_abs <= abs_tol or (rel_tol is not None and max_rel <= rel_tol)
+    worst = np.argsort(per_file)[::-1][:WORST_FILES]
+    return {
+        'stage': name,
+        'max_abs': max_abs,
+        'max_rel': max_rel,
+        'mean_abs': float(diff.mean()),
+        'passed': passed,
+        'worst': [(files[i], float(per_file[i])) for i in worst if per_file[i] > 0],
+    }
+
+
+def compare_decisions(reference, results, n_trees, files):
+    """
+    Vote-margin stage for an early-stopping engine. The skipped trees can
+    move each class's votes by at most their number, so the full forest's
+    leader votes must fall in the reported range and its margin within
+    that many votes of the margin at which the engine stopped.
+    """
+    ordered = np.sort(reference, axis=1)
+    full_margin = n_trees * (ordered[:, -1] - ordered[:, -2])
+    full_leader = n_trees * ordered[:, -1]
+    skipped = np.array([n_trees - r['trees_used'] for r in results], dtype=float)
+    stop_margin = np.array([r['margin'] for r in results])
+    low, high = (n_trees / 100 * np.array([r['confidence_range'] for r in results])).T
+    per_file = np.maximum.reduce([
+        np.abs(full_margin - stop_margin) - skipped,
+        low - full_leader,
+        full_leader - high,
+        np.zeros(len(results)),
+    ])
+    max_abs = float(per_file.max()) if len(per_file) else 0.0
+    worst = np.argsort(per_file)[::-1][:WORST_FILES]
+    return {
+        'stage': 'vote margin',
+        'max_abs': max_abs,
+        'max_rel': max_abs / n_trees,
+        'mean_abs': float(per_file.mean()) if len(per_file) else 0.0,
+        'passed': max_abs <= TOLERANCES['vote margin'][0],
+        'worst': [(files[i], float(per_file[i])) for i in worst if per_file[i] > 0],
+    }
+
+
+def check(pipeline_name='reference', engine_name='reference', every=1,
+          golden_path=GOLDEN_PATH):
+    """Compare a pipeline/engine pair with the reference; returns True on pass"""
+    if not Path(golden_path).exists():
+        print(f"✗ Reference not found: {golden_path} (run with --generate)")
+        return False
+
+    golden = np.load(golden_path)
+    indices = np.arange(0, len(golden['files']), every)
+    files = [str(f) for f in golden['files'][indices]]
+
+    model = load_quiet_model()
+    engine = ENGINES.get(engine_name) or DECISION_ENGINES[engine_name]
+    start = time.perf_counter()
+    features, scaled, output = run_pipeline(model, files, PIPELINES[pipeline_name], engine)
+    elapsed = time.perf_counter() - start
+
+    reference = golden['probabilities'][indices]
+    stages = [
+        compare_stage('features', golden['features'][indices], features, files),
+        compare_stage('scaled', golden['scaled'][indices], scaled, files),
+    ]
+    reference_labels = np.argmax(reference, axis=1)
+    if engine_name in ENGINES:
+        stages.append(compare_stage('probabilities', reference, output, files))
+        labels = np.argmax(output, axis=1)
+    else:
+        n_trees = len(model['classifier'].estimators_)
+        stages.append(compare_decisions(reference, output, n_trees, files))
+        reference_labels = audio_pipeline._decode(model, golden['classes'][reference_labels])
+        labels = np.array([result['label'] for result in output])
+    agreement = float(np.mean(labels == reference_labels))
+
+    print("=" * 70)
+    print(f"GOLDEN CHECK: pipeline={pipeline_name} engine={engine_name} "
+          f"({len(files)} files, {elapsed:.1f}s)")
+    print("=" * 70)
+    print(f"{'Stage':<15} {'Max abs':>11} {'Max rel':>11} {'Mean abs':>11}  Result")
+    print("-" * 70)
+    for stage in stages:
+        print(f"{stage['stage']:<15} {stage['max_abs']:>11.3g} {stage['max_rel']:>11.3g} "
+              f"{stage['mean_abs']:>11.3g}  {'✓' if stage['passed'] else '✗'}")
+    labels_ok = agreement >= MIN_LABEL_AGREEMENT
+    print(f"{'labels':<15} {100 * agreement:>10.2f}% agreement"
+          f"{'':>13}  {'✓' if labels_ok else '✗'}")
+
+    for stage in stages:
+        if stage['worst']:
+            print(f"\nWorst {stage['stage']}:")
+            for name, error in stage['worst']:
+                print(f"  {error:>11.3g}  {name}")
+    mismatched = [files[i] for i in np.flatnonzero(labels != reference_labels)]
+    if mismatched:
+        print(f"\nLabel mismatches ({len(mismatched)}):")
+        for name in mismatched[:WORST_FILES]:
+            print(f"  {name}")
+
+    return labels_ok and all(stage['passed'] for stage in stages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check pipelines against the golden reference")
+    parser.add_argument('--generate', action='store_true', help="Rebuild the reference dump")
+    parser.add_argument('--pipeline', default='reference', choices=sorted(PIPELINES),
+                        help="Feature pipeline to check (default: %(default)s)")
+    parser.add_argument('--engine', default=None, choices=sorted({**ENGINES, **DECISION_ENGINES}),
+                        help="Inference engine to check (default: every engine)")
+    parser.add_argument('--every', type=int, default=1,
+                        help="Check every Nth file for a quicker run (default: %(default)s)")
+    parser.add_argument('--golden', type=Path, default=GOLDEN_PATH,
+                        help="Reference dump (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.generate:
+        generate(args.golden)
+        return
+
+    engines = [args.engine] if args.engine else list(ENGINES) + list(DECISION_ENGINES)
+    passed = True
+    for engine_name in engines:
+        passed &= check(args.pipeline, engine_name, args.every, args.golden)
+    print("\n" + ("✅ EQUIVALENT" if passed else "❌ DRIFT DETECTED"))
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
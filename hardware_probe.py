@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Measured hardware probe and auto-tuner.
+Runs short micro-benchmarks of the real pipeline stages on this machine
+(per-stage latency, worker-pool scaling, forest batch throughput, float32 vs
+float64) and checks memory headroom, then writes a tuning profile that the
+GUI and the batch tools read at startup.
+
+Usage:
+    python3 hardware_probe.py              # probe and write tuning_profile.json
+    python3 hardware_probe.py --show       # print the current profile
+"""
+
+import argparse
+import json
+import os
+import platform
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import audio_pipeline
+
+PROFILE_PATH = Path(__file__).parent / "tuning_profile.json"
+
+# Used whenever no profile has been written yet
+DEFAULT_PROFILE = {
+    'workers': os.cpu_count() or 1,
+    'batch_size': 32,
+    'feature_cache_entries': 64,
+    'precision': 'float64',
+}
+
+PROBE_FILES = 40               # Recordings timed per benchmark
+BATCH_SIZES = [1, 4, 16, 64]
+KNEE = 0.9                     # Accept settings within 10% of the best
+CACHE_BUDGET_FRACTION = 0.02   # Share of available memory for the feature cache
+MAX_CACHE_ENTRIES = 4096
+WORKER_MEMORY_FRACTION = 0.5   # Share of available memory workers may use
+
+
+def load_tuning_profile(profile_path=PROFILE_PATH):
+    """Tuning profile merged over DEFAULT_PROFILE (defaults if none exists)"""
+    profile = dict(DEFAULT_PROFILE)
+    try:
+        with open(profile_path) as f:
+            stored = json.load(f)
+        profile.update({k: stored[k] for k in DEFAULT_PROFILE if k in stored})
+    except (OSError, ValueError):
+        pass
+    return profile
+
+
+def apply_tuning_profile(profile=None):
+    """Apply process-wide settings (feature cache size); returns the profile"""
+    profile = profile or load_tuning_profile()
+    audio_pipeline.feature_cache.resize(profile['feature_cache_entries'])
+    return profile
+
+
+def usable_cores():
+    """Cores this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def memory_info():
+    """(total, available) bytes from /proc/meminfo, or (None, None)"""
+    values = {}
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                key, value = line.split(':', 1)
+                values[key] = int(value.split()[0]) * 1024
+    except (OSError, ValueError):
+        return None, None
+    return values.get('MemTotal'), values.get('MemAvailable')
+
+
+def _best_time(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure_stages(model, files):
+    """Median milliseconds per pipeline stage over `files`"""
+    from scipy.io import wavfile
+    from scipy import signal
+
+    stages = {name: [] for name in ('read', 'resample', 'highpass', 'dwt', 'forest')}
+    b, a = audio_pipeline.highpass_coefficients()
+    for path in files:
+        stages['read'].append(_best_time(lambda: wavfile.read(path)))
+        sr, audio = wavfile.read(path)
+        audio = audio_pipeline.to_float(audio_pipeline.first_channel(audio))
+        num_samples = int(len(audio) * audio_pipeline.TARGET_SR / sr)
+        stages['resample'].append(_best_time(lambda: signal.resample(audio, num_samples)))
+        resampled = signal.resample(audio, num_samples)
+        stages['highpass'].append(_best_time(lambda: signal.filtfilt(b, a, resampled)))
+        window = audio_pipeline.fit_length(audio_pipeline.preprocess(audio, sr),
+                                           audio_pipeline.TARGET_LENGTH)
+        stages['dwt'].append(_best_time(
+            lambda: audio_pipeline.dwt_features(window, model['feature_shape'])))
+        features = audio_pipeline.dwt_features(window, model['feature_shape'])
+        stages['forest'].append(_best_time(lambda: audio_pipeline.predict(model, features), 1))
+    return {name: 1000 * float(np.median(times)) for name, times in stages.items()}
+
+
+def measure_precision(model, files):
+    """Median extract ms per precision and whether labels/probabilities agree"""
+    results = {}
+    probabilities = {}
+    for precision in ('float64', 'float32'):
+        times, probs = [], []
+        for path in files:
+            times.append(_best_time(
+                lambda: audio_pipeline.extract_features(path, model['feature_shape'], precision)))
+            features = audio_pipeline.extract_features(path, model['feature_shape'], precision)
+            scaled = model['scaler'].transform(np.asarray(features, dtype=np.float64))
+            probs.append(model['classifier'].predict_proba(scaled)[0])
+        results[precision] = 1000 * float(np.median(times))
+        probabilities[precision] = np.array(probs)
+    results['agree'] = bool(np.array_equal(probabilities['float64'], probabilities['float32']))
+    return results
+
+
+def measure_batches(model, files):
+    """Milliseconds per row of scaler + forest at each batch size"""
+    rows = np.vstack([audio_pipeline.extract_features(path, model['feature_shape'])
+                      for path in files])
+    per_row = {}
+    for size in BATCH_SIZES:
+        batch = np.resize(rows, (size, rows.shape[1]))
+        per_row[size] = 1000 * _best_time(lambda: audio_pipeline.predict(model, batch)) / size
+    return per_row
+
+
+_worker_model = None
+
+
+def _init_worker():
+    global _worker_model
+    warnings.filterwarnings('ignore')
+    # Parallelism comes from the pool; avoid joblib threads per worker
+    _worker_model = audio_pipeline.load_model(n_jobs=1)
+
+
+def _worker_rss(_):
+    return audio_pipeline.current_rss()
+
+
+def _worker_classify(path):
+    features = audio_pipeline.extract_features(path, _worker_model['feature_shape'])
+    return audio_pipeline.predict(_worker_model, features)[0]
+
+
+def measure_workers(files, max_workers):
+    """Files per second for each pool size, plus one worker's RSS in bytes"""
+    throughput = {}
+    worker_rss = None
+    for workers in range(1, max_workers + 1):
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            # Warm every worker (model load) before timing
+            rss = [r for r in pool.map(_worker_rss, range(workers)) if r]
+            if rss:
+                worker_rss = max(rss)
+            start = time.perf_counter()
+            list(pool.map(_worker_classify, files * 2))
+            throughput[workers] = 2 * len(files) / (time.perf_counter() - start)
+    return throughput, worker_rss
+
+
+def choose_settings(precision, batch_ms, throughput, worker_rss, available):
+    """Tuning profile values from the measurements"""
+    # Workers: fewest reaching KNEE of the best throughput, capped by memory
+    best = max(throughput.values())
+    workers = min(w for w, rate in throughput.items() if rate >= KNEE * best)
+    if worker_rss and available:
+        workers = max(1, min(workers, int(available * WORKER_MEMORY_FRACTION // worker_rss)))
+
+    # Batch size: smallest within KNEE of the best per-row cost
+    best_row = min(batch_ms.values())
+    batch_size = min(size for size, ms in batch_ms.items() if best_row >= KNEE * ms)
+
+    # Feature cache: a small share of available memory
+    row_bytes = 8 * audio_pipeline.DEFAULT_FEATURES
+    if available:
+        cache_entries = int(min(MAX_CACHE_ENTRIES, available * CACHE_BUDGET_FRACTION // row_bytes))
+    else:
+        cache_entries = DEFAULT_PROFILE['feature_cache_entries']
+
+    # float32 only when it agrees exactly and is measurably faster
+    faster = precision['float32'] <= KNEE * precision['float64']
+    chosen_precision = 'float32' if precision['agree'] and faster else 'float64'
+
+    return {
+        'workers': workers,
+        'batch_size': batch_size,
+        'feature_cache_entries': cache_entries,
+        'precision': chosen_precision,
+    }
+
+
+def run_probe(max_workers=None):
+    """Run every micro-benchmark; returns the full tuning profile dict"""
+    warnings.filterwarnings('ignore')
+    cores = usable_cores()
+    total, available = memory_info()
+    files = [str(f) for f in audio_pipeline.dataset_files(interleave=True, limit=PROBE_FILES)]
+
+    model = audio_pipeline.load_model()
+
+    print(f"Probing {platform.machine()} with {cores} cores...")
+    stage_ms = measure_stages(model, files[:10])
+    print("  ✓ stage latencies")
+    precision = measure_precision(model, files[:10])
+    print("  ✓ float32 vs float64")
+    batch_ms = measure_batches(model, files)
+    print("  ✓ forest batch sizes")
+    throughput, worker_rss = measure_workers(files, max_workers or cores)
+    print("  ✓ worker scaling")
+
+    profile = choose_settings(precision, batch_ms, throughput, worker_rss, available)
+    profile['created'] = datetime.now().isoformat(timespec='seconds')
+    profile['machine'] = f"{platform.system()} {platform.machine()}"
+    profile['measurements'] = {
+        'cores': cores,
+        'memory_total_bytes': total,
+        'memory_available_bytes': available,
+        'worker_rss_bytes': worker_rss,
+        'stage_ms': stage_ms,
+        'extract_ms': {k: precision[k] for k in ('float64', 'float32')},
+        'float32_agrees': precision['agree'],
+        'forest_ms_per_row': {str(k): v for k, v in batch_ms.items()},
+        'files_per_second': {str(k): v for k, v in throughput.items()},
+    }
+    return profile
+
+
+def print_profile(profile):
+    print("=" * 60)
+    print("TUNING PROFILE")
+    print("=" * 60)
+    for key in DEFAULT_PROFILE:
+        print(f"  {key:<22} {profile[key]}")
+    measurements = profile.get('measurements')
+    if not measurements:
+        print("\n  (defaults - run hardware_probe.py to measure)")
+        return
+    print(f"\nMeasured on {profile.get('machine')} at {profile.get('created')}:")
+    print(f"  {'Stage':<12} {'ms':>8}")
+    for stage, ms in measurements['stage_ms'].items():
+        print(f"  {stage:<12} {ms:>8.2f}")
+    print(f"\n  {'Workers':<12} {'files/s':>8}")
+    for workers, rate in measurements['files_per_second'].items():
+        print(f"  {workers:<12} {rate:>8.1f}")
+    print(f"\n  {'Batch':<12} {'ms/row':>8}")
+    for size, ms in measurements['forest_ms_per_row'].items():
+        print(f"  {size:<12} {ms:>8.2f}")
+    if measurements['memory_available_bytes']:
+        print(f"\n  Memory available: {measurements['memory_available_bytes'] / 1e9:.1f} GB, "
+              f"per worker: {(measurements['worker_rss_bytes'] or 0) / 1e6:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure this device and write a tuning profile")
+    parser.add_argument('--show', action='store_true', help="Print the current profile")
+    parser.add_argument('--max-workers', type=int, default=None,
+                        help="Largest pool size to try (default: usable cores)")
+    parser.add_argument('--output', type=Path, default=PROFILE_PATH,
+                        help="Profile path (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.show:
+        stored = {}
+        if args.output.exists():
+            with open(args.output) as f:
+                stored = json.load(f)
+        print_profile({**load_tuning_profile(args.output), **stored})
+        return
+
+    profile = run_probe(args.max_workers)
+    with open(args.output, 'w') as f:
+        json.dump(profile, f, indent=2)
+    print()
+    print_profile(profile)
+    print(f"\n✓ Profile written: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
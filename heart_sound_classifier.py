@@ -7,22 +7,37 @@ Optimized for MHS 35 LCD Display (320x480)
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter import ttk
-import pickle
+import argparse
 import numpy as np
 import os
+import sqlite3
+import threading
 from pathlib import Path
 from scipy.io import wavfile
-from scipy import signal
-import pywt
 import matplotlib
 matplotlib.use('TkAgg')  # Use Tkinter backend
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 
+import adaptive_quality
+import audio_pipeline
+import dataset_catalog
+import early_exit_forest
+import hardware_probe
+import profiling
+import segmentation
+import warmup
+
 class HeartSoundClassifier:
-    def __init__(self, root):
+    def __init__(self, root, precision=None, early_exit=False, latency_target=None,
+                 all_channels=False, cycles=False):
         self.root = root
+        self.precision = precision  # None/'float64' (training) or 'float32'
+        self.early_exit = early_exit  # Vote-margin early exit (same labels)
+        self.latency_target = latency_target  # Seconds; enables adaptive mode
+        self.all_channels = all_channels  # Score every site of multi-channel files
+        self.cycles = cycles  # Cycle-aligned windows + heart rate
         self.root.title("Heart Sound Classifier")
         
         # Optimize for MHS 35 LCD (320x480)
@@ -42,10 +57,25 @@ class HeartSoundClassifier:
         self.scaler = None
         self.label_encoder = None
         self.feature_shape = None
+        self.model_sha256 = None
         self.load_model()
         
-        # Dataset path
+        # Throttling-aware mode selection (only with a latency target)
+        self.adaptive = None
+        if latency_target is not None and self.model is not None:
+            self.adaptive = adaptive_quality.AdaptiveClassifier(
+                self.get_model_components(), latency_target, precision=precision
+            )
+        
+        # Dataset path and its index (class, duration, cached predictions)
         self.dataset_path = Path(__file__).parent / "Yaseen_Khan"
+        # The catalog is only a cache: without it the picker lists the folder
+        try:
+            self.catalog = dataset_catalog.DatasetCatalog()
+        except (sqlite3.Error, OSError) as e:
+            print(f"Dataset catalog unavailable, continuing without it: {e}")
+            self.catalog = None
+        self.catalog_refresh = None
         
         # Class labels (based on folder structure)
         self.class_labels = {
@@ -59,30 +89,106 @@ class HeartSoundClassifier:
         # Create GUI
         self.create_widgets()
         
+        # Pay first-call costs in the background so the first Classify
+        # press is as fast as the rest (see warmup.py)
+        self.warmup_result = None
+        if self.model is not None:
+            threading.Thread(target=self.run_warmup, daemon=True).start()
+            self.root.after(200, self.show_warmup)
+        
+        # Index new or changed recordings off the Tk thread (the first run
+        # hashes every WAV)
+        self.start_catalog_refresh()
+        
+    def run_warmup(self):
+        """Background thread: synthetic recording through the real path"""
+        try:
+            self.warmup_result = warmup.warm_up(self.get_model_components(), self.precision)
+            print(warmup.describe(self.warmup_result))
+        except Exception as e:
+            self.warmup_result = {'error': str(e)}
+            print(f"Warm-up failed: {e}")
+            
+    def start_catalog_refresh(self):
+        """Refresh the catalog in the background unless a refresh is running"""
+        if self.catalog is None:
+            return
+        if self.catalog_refresh is None or not self.catalog_refresh.is_alive():
+            self.catalog_refresh = threading.Thread(target=self.run_catalog_refresh, daemon=True)
+            self.catalog_refresh.start()
+            
+    def run_catalog_refresh(self):
+        """Background thread: pick up added or changed recordings"""
+        # SQLite connections belong to the thread that opened them
+        catalog = None
+        try:
+            catalog = dataset_catalog.DatasetCatalog()
+            added, updated, removed = catalog.refresh()
+            if added or updated or removed:
+                print(f"Catalog: {added} added, {updated} updated, {removed} removed")
+        except Exception as e:
+            print(f"Catalog refresh failed: {e}")
+        finally:
+            if catalog is not None:
+                catalog.close()
+            
+    def picker_rows(self, label, search, misclassified):
+        """(stored path, cached prediction) rows for the picker"""
+        if self.catalog is not None:
+            try:
+                return [(row['path'], row['prediction'])
+                        for row in self.catalog.query(label, search, misclassified)]
+            except sqlite3.Error as e:
+                print(f"Catalog query failed, listing the folder instead: {e}")
+        if misclassified:
+            return []  # Needs cached predictions
+        return [(str(path), None) for path in sorted((self.dataset_path / label).glob("*.wav"))
+                if search in path.name]
+            
+    def store_result(self, prediction, confidence, quality='ok'):
+        """Cache a result in the catalog; a catalog error never fails classification"""
+        if self.catalog is None:
+            return
+        try:
+            self.catalog.store_prediction(self.current_file, prediction, confidence,
+                                          self.model_sha256, quality)
+        except sqlite3.Error as e:
+            print(f"Could not cache the result in the catalog: {e}")
+            
+    def show_warmup(self):
+        """Poll from the Tk thread until the warm-up has finished"""
+        if self.warmup_result is None:
+            self.root.after(200, self.show_warmup)
+        elif 'error' not in self.warmup_result and self.status_bar.cget('text') == "Ready":
+            self.status_bar.config(
+                text=f"Ready (warm: {self.warmup_result['steady']:.0f} ms/classification)"
+            )
+        
     def load_model(self):
         """Load the pickled Random Forest model"""
         try:
-            model_path = Path(__file__).parent / "heart_sound_rf_model.pkl"
-            with open(model_path, 'rb') as f:
-                model_data = pickle.load(f)
-            
-            # Check if it's a dictionary with multiple components
-            if isinstance(model_data, dict):
-                self.model = model_data.get('classifier')
-                self.scaler = model_data.get('scaler')
-                self.label_encoder = model_data.get('label_encoder')
-                self.feature_shape = model_data.get('feature_shape')
-                print(f"Model loaded successfully! (Accuracy: {model_data.get('accuracy', 'N/A')})")
+            model_data = audio_pipeline.load_model()
+            self.model = model_data['classifier']
+            self.scaler = model_data['scaler']
+            self.label_encoder = model_data['label_encoder']
+            self.feature_shape = model_data['feature_shape']
+            self.model_sha256 = audio_pipeline.file_sha256(audio_pipeline.MODEL_PATH)
+            if model_data['accuracy'] is not None:
+                print(f"Model loaded successfully! (Accuracy: {model_data['accuracy']})")
             else:
-                # If it's just the model directly
-                self.model = model_data
-                self.scaler = None
-                self.label_encoder = None
-                self.feature_shape = None
                 print("Model loaded successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load model:\n{str(e)}")
             
+    def get_model_components(self):
+        """Model parts in the dict layout used by audio_pipeline"""
+        return {
+            'classifier': self.model,
+            'scaler': self.scaler,
+            'label_encoder': self.label_encoder,
+            'feature_shape': self.feature_shape,
+        }
+            
     def create_widgets(self):
         """Create GUI components optimized for small screen"""
         
@@ -220,7 +326,8 @@ class HeartSoundClassifier:
             text="",
             font=("Arial", 9),
             bg="white",
-            fg="#666"
+            fg="#666",
+            wraplength=280
         )
         self.confidence_label.pack(pady=5)
         
@@ -283,6 +390,17 @@ class HeartSoundClassifier:
         
         category_var.set('N')  # Default selection
         
+        # Filters
+        filter_frame = tk.Frame(picker)
+        filter_frame.pack(pady=2, padx=10, fill='x')
+        tk.Label(filter_frame, text="Search:", font=("Arial", 9)).pack(side=tk.LEFT)
+        search_var = tk.StringVar()
+        tk.Entry(filter_frame, textvariable=search_var, width=10,
+                 font=("Arial", 9)).pack(side=tk.LEFT, padx=3)
+        misclassified_var = tk.BooleanVar()
+        tk.Checkbutton(filter_frame, text="Misclassified", variable=misclassified_var,
+                       font=("Arial", 9)).pack(side=tk.LEFT)
+        
         # File listbox
         tk.Label(picker, text="Select File:", font=("Arial", 10, "bold")).pack(pady=5)
         
@@ -300,26 +418,44 @@ class HeartSoundClassifier:
         file_listbox.pack(side=tk.LEFT, fill='both', expand=True)
         scrollbar.config(command=file_listbox.yview)
         
+        # Pick up added or changed recordings in the background (only those
+        # are re-read); the list is redrawn when the refresh finishes
+        self.start_catalog_refresh()
+        shown = []
+        
         def update_files(*args):
-            """Update file list when category changes"""
+            """Update file list when category or filters change"""
             file_listbox.delete(0, tk.END)
-            cat = category_var.get()
-            cat_path = self.dataset_path / cat
-            if cat_path.exists():
-                files = sorted([f.name for f in cat_path.glob("*.wav")])
-                for f in files:
-                    file_listbox.insert(tk.END, f)
+            shown.clear()
+            for path, prediction in self.picker_rows(category_var.get(), search_var.get().strip(),
+                                                     misclassified_var.get()):
+                shown.append(path)
+                text = Path(path).name
+                if prediction is not None:
+                    text += f"  → {prediction}"
+                file_listbox.insert(tk.END, text)
         
         category_var.trace('w', update_files)
+        search_var.trace('w', update_files)
+        misclassified_var.trace('w', update_files)
         update_files()  # Initial load
         
+        def reload_when_indexed():
+            """Redraw the list once the background refresh has finished"""
+            if not picker.winfo_exists():
+                return
+            if self.catalog_refresh is not None and self.catalog_refresh.is_alive():
+                picker.after(200, reload_when_indexed)
+            else:
+                update_files()
+        
+        picker.after(200, reload_when_indexed)
+        
         def select_file():
             """Load selected file"""
             selection = file_listbox.curselection()
             if selection:
-                filename = file_listbox.get(selection[0])
-                cat = category_var.get()
-                filepath = self.dataset_path / cat / filename
+                filepath = dataset_catalog.resolve(shown[selection[0]])
                 self.load_audio_file(str(filepath))
                 picker.destroy()
             else:
@@ -347,78 +483,12 @@ class HeartSoundClassifier:
         
     def extract_features(self, audio_path):
         """
-        Extract features using the EXACT same preprocessing as training:
-        1. Load WAV file
-        2. Downsample to 1 kHz
-        3. High-pass filter (Butterworth, 20 Hz)
-        4. Z-score normalization
-        5. Pad/trim to 3 seconds
-        6. DWT decomposition (coif5, level 5) - or db4 if updated
+        Extract features using the EXACT same preprocessing as training
+        (see audio_pipeline.extract_features)
         """
-        try:
-            # Step 1: Load audio file
-            sr, audio = wavfile.read(audio_path)
-            
-            # Convert to float32 if needed
-            if audio.dtype == np.int16:
-                audio = audio.astype(np.float32) / 32768.0
-            elif audio.dtype == np.int32:
-                audio = audio.astype(np.float32) / 2147483648.0
-            
-            # Handle stereo (take first channel)
-            if len(audio.shape) > 1:
-                audio = audio[:, 0]
-            
-            # Step 2: Downsample to 1 kHz
-            target_sr = 1000
-            if sr != target_sr:
-                num_samples = int(len(audio) * target_sr / sr)
-                audio = signal.resample(audio, num_samples)
-            
-            # Step 3: High-pass filter (Butterworth, 20 Hz cutoff, 4th order)
-            nyquist = target_sr / 2
-            normalized_cutoff = 20 / nyquist
-            b, a = signal.butter(4, normalized_cutoff, btype='high')
-            audio = signal.filtfilt(b, a, audio)
-            
-            # Step 4: Z-score normalization
-            mean = np.mean(audio)
-            std = np.std(audio)
-            if std > 0:
-                audio = (audio - mean) / std
-            
-            # Step 5: Pad or trim to 3 seconds (3000 samples at 1 kHz)
-            target_length = 3000
-            if len(audio) > target_length:
-                audio = audio[:target_length]
-            elif len(audio) < target_length:
-                padding = target_length - len(audio)
-                audio = np.pad(audio, (0, padding), mode='constant')
-            
-            # Step 6: DWT feature extraction
-            # Using coif5 (or change to 'db4' to match paper exactly)
-            wavelet = 'coif5'  # Change to 'db4' or 'db8' if you retrain with Daubechies
-            level = 5
-            
-            coeffs = pywt.wavedec(audio, wavelet, level=level)
-            
-            # Extract detail coefficients only (discard approximation)
-            dwt_features = np.concatenate(coeffs[1:])
-            
-            # Ensure we have the expected number of features
-            expected_features = self.feature_shape if self.feature_shape else 3020
-            
-            if len(dwt_features) > expected_features:
-                dwt_features = dwt_features[:expected_features]
-            elif len(dwt_features) < expected_features:
-                # Pad with zeros if needed
-                padding = expected_features - len(dwt_features)
-                dwt_features = np.pad(dwt_features, (0, padding), mode='constant')
-            
-            return dwt_features.reshape(1, -1)
-            
-        except Exception as e:
-            raise Exception(f"Feature extraction failed: {str(e)}")
+        return audio_pipeline.feature_cache.extract_features(
+            audio_path, self.feature_shape, self.precision
+        )
             
     def classify_audio(self):
         """Classify the selected audio file"""
@@ -434,26 +504,47 @@ class HeartSoundClassifier:
             self.status_bar.config(text="Processing...")
             self.root.update()
             
-            # Extract features
-            features = self.extract_features(self.current_file)
-            
-            # Apply scaler if available
-            if self.scaler is not None:
-                features = self.scaler.transform(features)
-            
-            # Make prediction
-            prediction = self.model.predict(features)[0]
-            
-            # Decode label if label encoder is available
-            if self.label_encoder is not None:
-                prediction = self.label_encoder.inverse_transform([prediction])[0]
-            
-            # Get probability if available
-            if hasattr(self.model, 'predict_proba'):
-                probabilities = self.model.predict_proba(features)[0]
-                confidence = np.max(probabilities) * 100
+            with profiling.profile_classification(os.path.basename(self.current_file)):
+                if self.all_channels:
+                    # Every auscultation site in one batched pass
+                    result = audio_pipeline.classify_multichannel_file(
+                        self.get_model_components(), self.current_file, self.precision
+                    )
+                    prediction, confidence = result['label'], result['confidence']
+                    sites = [c['label'] or f"-({c['rejected']})" for c in result['channels']]
+                    detail_text = f"\nSites: {', '.join(sites)}" if len(sites) > 1 else ""
+                elif self.cycles:
+                    # S1-aligned windows and heart rate from one filtered signal
+                    result = segmentation.classify_cycles_file(
+                        self.get_model_components(), self.current_file, self.precision
+                    )
+                    prediction, confidence = result['label'], result['confidence']
+                    detail_text = (f"\nHR {result['heart_rate']:.0f} bpm, {result['cycles']} cycles"
+                                   if result['heart_rate'] is not None else "")
+                elif self.adaptive is not None:
+                    # Mode picked from CPU frequency, temperature and load
+                    result = self.adaptive.classify_file(self.current_file)
+                    prediction, confidence = result['label'], result['confidence']
+                    detail_text = f" [{result['mode']} mode]"
+                elif self.early_exit and hasattr(self.model, 'estimators_'):
+                    # Stop voting once the leading class can't be overtaken
+                    features = self.extract_features(self.current_file)
+                    result = early_exit_forest.predict_early_exit(
+                        self.get_model_components(), features
+                    )[0]
+                    prediction, confidence = result['label'], result['confidence']
+                    detail_text = f" ({result['trees_used']}/{len(self.model.estimators_)} trees)"
+                else:
+                    features = self.extract_features(self.current_file)
+                    
+                    # Scale, predict and decode label in one forest pass
+                    prediction, confidence = audio_pipeline.predict(
+                        self.get_model_components(), features
+                    )[0]
+                    detail_text = ""
+            if confidence is not None:
                 self.confidence_label.config(
-                    text=f"Confidence: {confidence:.1f}%"
+                    text=f"Confidence: {confidence:.1f}%{detail_text}"
                 )
             
             # Display result
@@ -465,9 +556,25 @@ class HeartSoundClassifier:
             
             self.status_bar.config(text=f"Classification complete: {result_text}")
             
+        except audio_pipeline.SignalQualityError as e:
+            # Unusable recording: show why instead of a misleading label
+            self.result_label.config(text="Poor Signal", fg=self.danger_color)
+            self.confidence_label.config(text=str(e))
+            self.status_bar.config(text=f"Recording rejected: {e.reason}")
+            if not self.all_channels:
+                self.store_result(None, None, e.reason)
+            messagebox.showwarning("Poor Signal Quality", f"{e}\n\nPlease record again.")
+            return
         except Exception as e:
             messagebox.showerror("Error", f"Classification failed:\n{str(e)}")
             self.status_bar.config(text="Classification failed")
+            return
+        
+        # Cache the result for catalogued recordings (no-op otherwise). Only
+        # the standard first-channel, first-window answer is cached: adaptive
+        # modes, cycle-aligned windows and the all-sites label may differ.
+        if self.adaptive is None and not self.cycles and not self.all_channels:
+            self.store_result(str(prediction), confidence)
     
     def show_waveform(self):
         """Display waveform visualization in a new window"""
@@ -482,45 +589,18 @@ class HeartSoundClassifier:
             # Load raw audio
             sr, audio = wavfile.read(self.current_file)
             
-            # Convert to float32 if needed
-            if audio.dtype == np.int16:
-                audio = audio.astype(np.float32) / 32768.0
-            elif audio.dtype == np.int32:
-                audio = audio.astype(np.float32) / 2147483648.0
-            
-            # Handle stereo
-            if len(audio.shape) > 1:
-                audio = audio[:, 0]
+            # Convert to float32 and take the first channel
+            audio = audio_pipeline.to_float(audio_pipeline.first_channel(audio))
             
             # Create time axis
             duration = len(audio) / sr
-            time = np.linspace(0, duration, len(audio))
-            
-            # Also load preprocessed version
-            # Downsample to 1 kHz
-            target_sr = 1000
-            if sr != target_sr:
-                num_samples = int(len(audio) * target_sr / sr)
-                audio_processed = signal.resample(audio, num_samples)
-            else:
-                audio_processed = audio.copy()
-            
-            # High-pass filter
-            nyquist = target_sr / 2
-            normalized_cutoff = 20 / nyquist
-            b, a = signal.butter(4, normalized_cutoff, btype='high')
-            audio_filtered = signal.filtfilt(b, a, audio_processed)
-            
-            # Z-score normalization
-            mean = np.mean(audio_filtered)
-            std = np.std(audio_filtered)
-            if std > 0:
-                audio_normalized = (audio_filtered - mean) / std
-            else:
-                audio_normalized = audio_filtered
+            
+            # Preprocessed version: 1 kHz, high-pass filtered, z-scored
+            target_sr = audio_pipeline.TARGET_SR
+            audio_normalized = audio_pipeline.preprocess(audio, sr)
             
             # Trim to 3 seconds for processed version
-            target_length = 3000
+            target_length = audio_pipeline.TARGET_LENGTH
             if len(audio_normalized) > target_length:
                 audio_normalized = audio_normalized[:target_length]
             
@@ -592,8 +672,32 @@ class HeartSoundClassifier:
             self.status_bar.config(text="Visualization failed")
 
 def main():
+    parser = argparse.ArgumentParser(description="Heart Sound Classifier GUI")
+    parser.add_argument('--profile', type=int, metavar='N', default=None,
+                        help="Profile the next N classifications (cProfile + tracemalloc)")
+    parser.add_argument('--profile-dir', default=None,
+                        help="Where to write profiles (default: ./profiles)")
+    parser.add_argument('--precision', choices=sorted(audio_pipeline.PRECISIONS), default=None,
+                        help="Signal processing precision (default: from tuning profile)")
+    parser.add_argument('--early-exit', action='store_true',
+                        help="Stop forest voting once the label is decided")
+    parser.add_argument('--adaptive', type=float, metavar='SECONDS', default=None,
+                        help="Adapt quality to CPU throttling/load to meet this latency")
+    parser.add_argument('--all-channels', action='store_true',
+                        help="Classify every channel (site) of multi-channel recordings")
+    parser.add_argument('--cycles', action='store_true',
+                        help="Score cycle-aligned windows and show the heart rate")
+    args = parser.parse_args()
+    if args.profile is not None:
+        profiling.configure(args.profile, args.profile_dir)
+    
+    # Measured per-device settings (see hardware_probe.py)
+    tuning = hardware_probe.apply_tuning_profile()
+    precision = args.precision or tuning['precision']
+    
     root = tk.Tk()
-    app = HeartSoundClassifier(root)
+    app = HeartSoundClassifier(root, precision, args.early_exit, args.adaptive,
+                               args.all_channels, args.cycles)
     root.mainloop()
 
 if __name__ == "__main__":
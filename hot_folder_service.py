@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Hot-folder ingestion service.
+Watches a directory for new WAV recordings, waits until each file has
+finished writing, classifies it on a bounded worker pool and appends the
+result to a CSV log. The log doubles as the progress ledger, so a restarted
+service never classifies the same recording twice.
+
+Usage:
+    python3 hot_folder_service.py /srv/incoming --results results.csv [--workers 4]
+"""
+
+import argparse
+import csv
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from datetime import datetime
+from pathlib import Path
+
+import audio_pipeline
+import hardware_probe
+import profiling
+
+POLL_SECONDS = 2.0        # Directory scan interval
+SETTLE_SECONDS = 3.0      # Size/mtime must be unchanged this long before ingesting
+
+RESULT_FIELDS = [
+    'timestamp', 'file', 'size', 'mtime_ns', 'status',
+    'prediction', 'confidence', 'seconds', 'error',
+]
+
+# Per-process model, loaded once by the pool initializer
+_worker_model = None
+
+
+def _init_worker(model_path):
+    """Pool initializer: load the model once per worker process"""
+    global _worker_model
+    # Ctrl-C reaches the whole process group; the parent decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Parallelism comes from the pool; avoid joblib threads per worker
+    _worker_model = audio_pipeline.load_model(model_path, n_jobs=1)
+
+
+def _classify_file(path):
+    """Worker task: classify one recording, never raising"""
+    start = time.perf_counter()
+    try:
+        with profiling.profile_classification(os.path.basename(path)):
+            features = audio_pipeline.extract_features(path, _worker_model['feature_shape'])
+            label, confidence = audio_pipeline.predict(_worker_model, features)[0]
+        return {
+            'status': 'ok',
+            'prediction': label,
+            'confidence': f"{confidence:.1f}" if confidence is not None else '',
+            'seconds': f"{time.perf_counter() - start:.3f}",
+            'error': '',
+        }
+    except audio_pipeline.SignalQualityError as e:
+        return {
+            'status': 'rejected',
+            'prediction': '',
+            'confidence': '',
+            'seconds': f"{time.perf_counter() - start:.3f}",
+            'error': str(e),
+        }
+    except Exception as e:
+        return {
+            'status': 'error',
+            'prediction': '',
+            'confidence': '',
+            'seconds': f"{time.perf_counter() - start:.3f}",
+            'error': str(e),
+        }
+
+
+def file_key(relpath, size, mtime_ns):
+    """Identity of one version of a recording in the ledger"""
+    return (str(relpath), int(size), int(mtime_ns))
+
+
+def load_ledger(results_path):
+    """Keys of every recording already recorded in the results CSV"""
+    done = set()
+    if not results_path.exists():
+        return done
+    with open(results_path, newline='') as f:
+        for row in csv.DictReader(f):
+            try:
+                done.add(file_key(row['file'], row['size'], row['mtime_ns']))
+            except (KeyError, TypeError, ValueError):
+                continue  # Torn last line from a crash
+    return done
+
+
+class ResultLog:
+    """Append-only CSV log, flushed and fsynced after every row"""
+
+    def __init__(self, results_path):
+        self.path = results_path
+        new_file = not results_path.exists() or results_path.stat().st_size == 0
+        self.file = open(results_path, 'a', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=RESULT_FIELDS)
+        if new_file:
+            self.writer.writeheader()
+            self._sync()
+
+    def append(self, key, result):
+        row = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'file': key[0],
+            'size': key[1],
+            'mtime_ns': key[2],
+        }
+        row.update(result)
+        self.writer.writerow(row)
+        self._sync()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+class HotFolderService:
+    """Polls a directory and feeds settled WAV files to a worker pool"""
+
+    def __init__(self, watch_dir, results_path, workers=None, poll_seconds=POLL_SECONDS,
+                 settle_seconds=SETTLE_SECONDS, recursive=False,
+                 model_path=audio_pipeline.MODEL_PATH):
+        self.watch_dir = Path(watch_dir)
+        self.results_path = Path(results_path)
+        self.workers = workers or hardware_probe.load_tuning_profile()['workers']
+        self.poll_seconds = poll_seconds
+        self.settle_seconds = settle_seconds
+        self.recursive = recursive
+        self.model_path = model_path
+
+        self.done = load_ledger(self.results_path)
+        self.pending = {}     # key -> first time seen with this size/mtime
+        self.in_flight = {}   # future -> key
+        self.running = True
+
+    def scan(self):
+        """
+        Keys of WAV files whose size and mtime have settled (empty files
+        included: run logs those as errors rather than waiting forever)
+        """
+        now = time.monotonic()
+        pattern = '**/*' if self.recursive else '*'
+        seen = set()
+        ready = []
+        for path in self.watch_dir.glob(pattern):
+            if path.suffix.lower() != '.wav' or not path.is_file():
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # Moved away between glob and stat
+            key = file_key(path.relative_to(self.watch_dir), stat.st_size, stat.st_mtime_ns)
+            if key in self.done or key in self.in_flight.values():
+                continue
+            seen.add(key)
+            first_seen = self.pending.setdefault(key, now)
+            if now - first_seen >= self.settle_seconds:
+                ready.append(key)
+
+        # A file still being written shows up under a new key every poll
+        self.pending = {k: t for k, t in self.pending.items() if k in seen}
+        return sorted(ready)
+
+    def run(self, once=False):
+        """Main loop; with once=True, drain the folder and return"""
+        log = ResultLog(self.results_path)
+        print(f"Watching {self.watch_dir} with {self.workers} workers "
+              f"({len(self.done)} recordings already logged)")
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(str(self.model_path),)) as pool:
+                while self.running:
+                    # Keep at most two tasks per worker queued
+                    capacity = 2 * self.workers - len(self.in_flight)
+                    for key in self.scan()[:max(0, capacity)]:
+                        self.pending.pop(key, None)
+                        path = self.watch_dir / key[0]
+                        if key[1] == 0 or not os.access(path, os.R_OK):
+                            # Settled but unusable: log it so it is not retried
+                            error = "Empty file" if key[1] == 0 else "File not readable"
+                            self._log(log, key, {'status': 'error', 'prediction': '',
+                                                 'confidence': '', 'seconds': '0.000',
+                                                 'error': error})
+                            continue
+                        future = pool.submit(_classify_file, str(path))
+                        self.in_flight[future] = key
+
+                    if self.in_flight:
+                        finished, _ = wait(list(self.in_flight), timeout=self.poll_seconds,
+                                           return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            self._record(log, future)
+                    elif once and not self.pending:
+                        break
+                    else:
+                        time.sleep(self.poll_seconds)
+
+                # Stopping: drop queued tasks (picked up again after a restart)
+                # and log the running ones so they are never classified twice
+                for future in list(self.in_flight):
+                    if future.cancel():
+                        del self.in_flight[future]
+                if self.in_flight:
+                    print(f"Stopping: finishing {len(self.in_flight)} in-flight recordings")
+                for future in as_completed(list(self.in_flight)):
+                    self._record(log, future)
+        finally:
+            log.close()
+
+    def _record(self, log, future):
+        """Log a finished task and mark its recording done"""
+        self._log(log, self.in_flight.pop(future), future.result())
+
+    def _log(self, log, key, result):
+        """Append one result to the ledger and mark its recording done"""
+        log.append(key, result)
+        self.done.add(key)
+        print(f"{key[0]}: {result['status']} {result['prediction']} "
+              f"{result['confidence'] or result['error']}")
+
+    def stop(self, *args):
+        """Finish in-flight work and exit the main loop"""
+        self.running = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify WAV files dropped into a folder")
+    parser.add_argument('watch_dir', help="Directory to watch")
+    parser.add_argument('--results', default='results.csv',
+                        help="CSV log of results, also used to resume (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes (default: from tuning_profile.json)")
+    parser.add_argument('--poll', type=float, default=POLL_SECONDS,
+                        help="Scan interval in seconds (default: %(default)s)")
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS,
+                        help="Seconds a file must stay unchanged (default: %(default)s)")
+    parser.add_argument('--recursive', action='store_true', help="Also watch subfolders")
+    parser.add_argument('--once', action='store_true',
+                        help="Process what is in the folder, then exit")
+    args = parser.parse_args()
+
+    if not Path(args.watch_dir).is_dir():
+        print(f"ERROR: Watch folder not found: {args.watch_dir}")
+        sys.exit(1)
+
+    service = HotFolderService(args.watch_dir, args.results, args.workers, args.poll,
+                               args.settle, args.recursive)
+    signal.signal(signal.SIGINT, service.stop)
+    signal.signal(signal.SIGTERM, service.stop)
+    service.run(once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Concurrent load generator and replay tool.
+Replays the bundled Yaseen_Khan recordings (or a recorded arrival trace)
+through the classification pipeline on a thread or process pool, either
+open-loop at a target arrival rate or closed-loop at a fixed concurrency.
+Reports throughput, latency and queueing-delay percentiles, error counts
+and memory over time, to size the device and find where GIL contention or
+memory pressure sets in.
+
+Usage:
+    python3 load_generator.py --rate 20 --duration 30 --executor thread
+    python3 load_generator.py --concurrency 8 --requests 400 --executor process
+    python3 load_generator.py --trace arrivals.csv          # replay a trace
+"""
+
+import argparse
+import csv
+import random
+import sys
+import time
+import warnings
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from pathlib import Path
+
+import numpy as np
+
+import audio_pipeline
+import hardware_probe
+
+INTERVAL_SECONDS = 5.0    # Width of each row in the over-time report
+TRACE_FIELDS = ['offset_s', 'file']
+
+# Model shared by every thread, or loaded once per worker process
+_worker_model = None
+
+
+def _init_worker(model_path):
+    """Pool initializer: load the model unless this process already has it"""
+    global _worker_model
+    warnings.filterwarnings('ignore')
+    if _worker_model is not None:
+        return
+    # Parallelism comes from the pool; avoid joblib threads per worker
+    _worker_model = audio_pipeline.load_model(model_path, n_jobs=1)
+
+
+def _classify(path):
+    """
+    Worker task: (start, end, error, rss) for one recording, never raising.
+    Times are time.monotonic(), which is shared across processes.
+    """
+    start = time.monotonic()
+    error = ''
+    try:
+        features = audio_pipeline.extract_features(path, _worker_model['feature_shape'])
+        audio_pipeline.predict(_worker_model, features)
+    except Exception as e:
+        error = str(e)
+    return start, time.monotonic(), error, audio_pipeline.current_rss()
+
+
+def _warm(_):
+    """Worker task that only forces the initializer to run"""
+    return _worker_model is not None
+
+
+def read_trace(trace_path):
+    """[(offset_s, path)] from a trace CSV, sorted by offset"""
+    with open(trace_path, newline='') as f:
+        arrivals = [(float(row['offset_s']), row['file']) for row in csv.DictReader(f)]
+    return sorted(arrivals)
+
+
+def write_trace(trace_path, arrivals):
+    """Save a schedule so the same load can be replayed later"""
+    with open(trace_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(TRACE_FIELDS)
+        for offset, path in arrivals:
+            writer.writerow([f"{offset:.6f}", path])
+
+
+def rate_schedule(files, rate, duration=None, requests=None, poisson=True, seed=0):
+    """
+    Open-loop arrivals at `rate` per second, cycling through `files`, until
+    `duration` seconds or `requests` arrivals. Poisson inter-arrival times
+    by default, fixed spacing otherwise.
+    """
+    rng = random.Random(seed)
+    arrivals = []
+    offset = 0.0
+    while True:
+        if requests is not None and len(arrivals) >= requests:
+            break
+        if duration is not None and offset >= duration:
+            break
+        arrivals.append((offset, files[len(arrivals) % len(files)]))
+        offset += rng.expovariate(rate) if poisson else 1.0 / rate
+    return arrivals
+
+
+def run_open_loop(pool, arrivals):
+    """
+    Submit each arrival at its offset; returns records with the scheduled
+    time so queueing delay includes time spent waiting for a free worker
+    """
+    records = []
+    begin = time.monotonic()
+    for offset, path in arrivals:
+        delay = begin + offset - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        records.append({'scheduled': begin + offset,
+                        'future': pool.submit(_classify, path)})
+    for record in records:
+        record['result'] = record.pop('future').result()
+    return begin, records
+
+
+def run_closed_loop(pool, files, concurrency, duration=None, requests=None):
+    """Keep `concurrency` requests in flight until `duration` or `requests`"""
+    records = []
+    pending = {}
+    begin = time.monotonic()
+    submitted = 0
+
+    def more():
+        if requests is not None and submitted >= requests:
+            return False
+        return duration is None or time.monotonic() - begin < duration
+
+    while pending or (submitted == 0 and more()):
+        while len(pending) < concurrency and more():
+            record = {'scheduled': time.monotonic()}
+            pending[pool.submit(_classify, files[submitted % len(files)])] = record
+            records.append(record)
+            submitted += 1
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.pop(future)['result'] = future.result()
+    return begin, records
+
+
+def summarize(begin, records):
+    """Per-request arrays relative to `begin` (seconds)"""
+    scheduled = np.array([r['scheduled'] for r in records]) - begin
+    start = np.array([r['result'][0] for r in records]) - begin
+    end = np.array([r['result'][1] for r in records]) - begin
+    errors = np.array([bool(r['result'][2]) for r in records])
+    rss = np.array([r['result'][3] or 0 for r in records], dtype=float)
+    return {
+        'scheduled': scheduled,
+        'queue': start - scheduled,
+        'service': end - start,
+        'latency': end - scheduled,
+        'end': end,
+        'errors': errors,
+        'rss': rss,
+        'messages': sorted({r['result'][2] for r in records if r['result'][2]}),
+    }
+
+
+def _percentiles(values):
+    if len(values) == 0:
+        return "      -        -        -"
+    p50, p95, p99 = 1000 * np.percentile(values, [50, 95, 99])
+    return f"{p50:>7.1f} {p95:>8.1f} {p99:>8.1f}"
+
+
+def print_report(stats, interval=INTERVAL_SECONDS):
+    """Over-time table followed by overall percentiles"""
+    completed = len(stats['end'])
+    elapsed = stats['end'].max() if completed else 0.0
+
+    print("=" * 78)
+    print(f"{'Window (s)':<12} {'Done':>5} {'Err':>4} {'Req/s':>7} "
+          f"{'Latency p50/p95/p99 (ms)':>26} {'Queue p95':>10} {'RSS MB':>7}")
+    print("-" * 78)
+    # A partial tail would give a noisy rate over a sliver of time: fold it
+    # into the last full window, which then runs to the end of the test
+    starts = list(np.arange(0.0, elapsed, interval))
+    if len(starts) > 1 and elapsed - starts[-1] < interval:
+        starts.pop()
+    for low, high in zip(starts, starts[1:] + [elapsed]):
+        last = high == elapsed
+        rows = (stats['end'] >= low) & ((stats['end'] <= high) if last else (stats['end'] < high))
+        if not rows.any():
+            continue
+        queue = f"{1000 * np.percentile(stats['queue'][rows], 95):>10.1f}"
+        print(f"{low:>5.0f}-{high:<6.0f} {int(rows.sum()):>5} "
+              f"{int(stats['errors'][rows].sum()):>4} {rows.sum() / (high - low):>7.1f} "
+              f"{_percentiles(stats['latency'][rows]):>26} {queue} "
+              f"{stats['rss'][rows].max() / 1e6:>7.0f}")
+
+    print("=" * 78)
+    print(f"{'':<14} {'p50 (ms)':>7} {'p95 (ms)':>8} {'p99 (ms)':>8}")
+    print(f"{'Latency':<14} {_percentiles(stats['latency'])}")
+    print(f"{'Queueing':<14} {_percentiles(stats['queue'])}")
+    print(f"{'Service':<14} {_percentiles(stats['service'])}")
+    print("-" * 78)
+    print(f"Requests:   {completed} in {elapsed:.1f}s "
+          f"({completed / elapsed if elapsed else 0:.1f} req/s)")
+    print(f"Errors:     {int(stats['errors'].sum())}")
+    for message in stats['messages'][:5]:
+        print(f"  ✗ {message}")
+    scope = "per worker process" if stats.get('executor') == 'process' else "whole process"
+    print(f"Peak RSS:   {stats['rss'].max() / 1e6:.0f} MB ({scope})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recordings through the pipeline under load")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument('--rate', type=float, default=None,
+                      help="Open loop: arrivals per second")
+    load.add_argument('--concurrency', type=int, default=None,
+                      help="Closed loop: requests kept in flight (default: 2 x workers)")
+    load.add_argument('--trace', type=Path, default=None,
+                      help="Replay arrivals from a CSV with columns offset_s,file")
+    parser.add_argument('--duration', type=float, default=None,
+                        help="Seconds to generate load (default: 30 unless --requests)")
+    parser.add_argument('--requests', type=int, default=None,
+                        help="Total requests to send")
+    parser.add_argument('--executor', choices=['thread', 'process'], default='process',
+                        help="Worker type (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Pool size (default: from tuning_profile.json)")
+    parser.add_argument('--uniform', action='store_true',
+                        help="Fixed arrival spacing instead of Poisson (with --rate)")
+    parser.add_argument('--interval', type=float, default=INTERVAL_SECONDS,
+                        help="Report window in seconds (default: %(default)s)")
+    parser.add_argument('--save-trace', type=Path, default=None,
+                        help="Write the generated arrival schedule as a trace CSV")
+    args = parser.parse_args()
+
+    if args.duration is None and args.requests is None and args.trace is None:
+        args.duration = 30.0
+    workers = args.workers or hardware_probe.load_tuning_profile()['workers']
+    files = [str(f) for f in audio_pipeline.dataset_files()]
+    random.Random(0).shuffle(files)
+
+    if args.trace:
+        arrivals = read_trace(args.trace)
+        mode = f"trace {args.trace.name} ({len(arrivals)} arrivals)"
+    elif args.rate:
+        arrivals = rate_schedule(files, args.rate, args.duration, args.requests,
+                                 poisson=not args.uniform)
+        mode = f"open loop {args.rate:g} req/s ({len(arrivals)} arrivals)"
+    else:
+        arrivals = None
+        concurrency = args.concurrency or 2 * workers
+        mode = f"closed loop, concurrency {concurrency}"
+    if args.save_trace and arrivals is not None:
+        write_trace(args.save_trace, arrivals)
+
+    print("=" * 78)
+    print(f"LOAD TEST: {mode}, {workers} {args.executor} workers")
+    print("=" * 78)
+
+    if args.executor == 'thread':
+        # One shared model, loaded before timing starts
+        _init_worker(audio_pipeline.MODEL_PATH)
+        pool = ThreadPoolExecutor(max_workers=workers)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(audio_pipeline.MODEL_PATH,))
+        # Warm the workers so model loading is not counted as queueing
+        list(pool.map(_warm, range(workers)))
+
+    try:
+        with pool:
+            if arrivals is not None:
+                begin, records = run_open_loop(pool, arrivals)
+            else:
+                begin, records = run_closed_loop(pool, files, concurrency,
+                                                 args.duration, args.requests)
+    except KeyboardInterrupt:
+        print("\nInterrupted")
+        sys.exit(1)
+
+    if not records:
+        print("No requests were sent")
+        sys.exit(1)
+    stats = summarize(begin, records)
+    stats['executor'] = args.executor
+    print_report(stats, args.interval)
+    if args.save_trace and arrivals is not None:
+        print(f"\n✓ Trace written: {args.save_trace}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Peak-memory and allocation regression suite.
+Measures peak RSS and tracemalloc peaks for each pipeline stage (model load,
+single-file classify, waveform display, batches of increasing size), counts
+the temporary arrays made per classification, and compares everything
+against a stored baseline.
+
+Every stage runs in a fresh subprocess so its RSS peak is not hidden by an
+earlier stage.
+
+Usage:
+    python3 memory_benchmark.py                     # measure and compare
+    python3 memory_benchmark.py --save-baseline     # record a new baseline
+"""
+
+import argparse
+import contextlib
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+BASELINE_PATH = Path(__file__).parent / "memory_baseline.json"
+BATCH_SIZES = [10, 50, 200]
+TOLERANCE = 0.10          # Allowed relative growth before flagging
+SLACK_BYTES = 1 << 20     # Ignore growth below 1 MB (allocator noise)
+
+# Functions whose returned arrays count as per-call temporaries,
+# as (label, module name, attribute)
+TEMPORARY_SOURCES = [
+    ('int->float', 'audio_pipeline', 'to_float'),
+    ('resample', 'scipy.signal', 'resample'),
+    ('filtfilt', 'scipy.signal', 'filtfilt'),
+    ('pad', 'numpy', 'pad'),
+    ('concatenate', 'numpy', 'concatenate'),
+]
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes (None on Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+@contextlib.contextmanager
+def count_temporaries():
+    """
+    Count arrays returned by TEMPORARY_SOURCES while the block runs.
+    Yields a dict label -> {'arrays': n, 'bytes': total}.
+    """
+    import importlib
+    counts = {label: {'arrays': 0, 'bytes': 0} for label, _, _ in TEMPORARY_SOURCES}
+    originals = []
+
+    def counting(label, func):
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            if isinstance(result, np.ndarray):
+                counts[label]['arrays'] += 1
+                counts[label]['bytes'] += result.nbytes
+            return result
+        return wrapper
+
+    for label, module_name, attribute in TEMPORARY_SOURCES:
+        module = importlib.import_module(module_name)
+        func = getattr(module, attribute)
+        originals.append((module, attribute, func))
+        setattr(module, attribute, counting(label, func))
+    try:
+        yield counts
+    finally:
+        for module, attribute, func in originals:
+            setattr(module, attribute, func)
+
+
+@contextlib.contextmanager
+def measure(result):
+    """Record wall time, tracemalloc peak and RSS growth of the block"""
+    import audio_pipeline
+    rss_before = audio_pipeline.current_rss()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        result['seconds'] = time.perf_counter() - start
+        result['traced_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        result['rss_peak_bytes'] = peak_rss()
+        if rss_before is not None and result['rss_peak_bytes'] is not None:
+            result['rss_growth_bytes'] = max(0, result['rss_peak_bytes'] - rss_before)
+
+
+def stage_model_load():
+    import audio_pipeline
+    result = {}
+    with measure(result):
+        audio_pipeline.load_model()
+    return result
+
+
+def stage_classify_single():
+    import audio_pipeline
+    model = audio_pipeline.load_model()
+    path = audio_pipeline.dataset_files(interleave=True, limit=1)[0]
+    result = {}
+    with measure(result):
+        features = audio_pipeline.extract_features(path, model['feature_shape'])
+        audio_pipeline.predict(model, features)
+
+    # Second, unmeasured call with counting wrappers installed
+    with count_temporaries() as counts:
+        audio_pipeline.extract_features(path, model['feature_shape'])
+    result['temporaries'] = counts
+    return result
+
+
+def stage_waveform():
+    """Same work as the GUI's Show Waveform, rendered off-screen"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from scipy.io import wavfile
+    import audio_pipeline
+
+    path = audio_pipeline.dataset_files(interleave=True, limit=1)[0]
+    result = {}
+    with measure(result):
+        sr, audio = wavfile.read(path)
+        audio = audio_pipeline.to_float(audio_pipeline.first_channel(audio))
+        processed = audio_pipeline.preprocess(audio, sr)[:audio_pipeline.TARGET_LENGTH]
+        time_axis = np.linspace(0, len(processed) / audio_pipeline.TARGET_SR, len(processed))
+        fig = Figure(figsize=(3.2, 3.5), dpi=100)
+        ax = fig.add_subplot(1, 1, 1)
+        ax.plot(time_axis, processed, color='#4CAF50', linewidth=1.2)
+        fig.tight_layout(pad=0.5)
+        FigureCanvasAgg(fig).draw()
+    return result
+
+
+def stage_batch(size):
+    import audio_pipeline
+    model = audio_pipeline.load_model()
+    files = audio_pipeline.dataset_files(interleave=True, limit=size)
+    result = {'files': len(files)}
+    with measure(result):
+        features = np.empty((len(files), model['feature_shape'] or audio_pipeline.DEFAULT_FEATURES))
+        for i, path in enumerate(files):
+            features[i] = audio_pipeline.extract_features(path, model['feature_shape'])[0]
+        audio_pipeline.predict(model, features)
+    return result
+
+
+def stage_names():
+    return ['model_load', 'classify_single', 'waveform'] + [f"batch_{n}" for n in BATCH_SIZES]
+
+
+def run_stage(name):
+    """Run one stage in this process and return its measurements"""
+    import warnings
+    warnings.filterwarnings('ignore')
+    if name.startswith('batch_'):
+        return stage_batch(int(name.split('_')[1]))
+    return globals()[f"stage_{name}"]()
+
+
+def run_all():
+    """Run every stage in its own subprocess"""
+    results = {}
+    for name in stage_names():
+        proc = subprocess.run(
+            [sys.executable, __file__, '--run-stage', name],
+            capture_output=True, text=True, cwd=Path(__file__).parent
+        )
+        if proc.returncode != 0:
+            print(f"✗ {name} failed:\n{proc.stderr}")
+            results[name] = {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr else 'failed'}
+            continue
+        results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """List of regression messages (empty when within tolerance)"""
+    regressions = []
+    metrics = ['traced_peak_bytes', 'rss_growth_bytes']
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or 'error' in result:
+            continue
+        for metric in metrics:
+            new, old = result.get(metric), base.get(metric)
+            if new is None or old is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > SLACK_BYTES:
+                regressions.append(f"{name}.{metric}: {old / 1e6:.1f} MB -> {new / 1e6:.1f} MB")
+        for label, count in result.get('temporaries', {}).items():
+            old = base.get('temporaries', {}).get(label, {}).get('arrays')
+            if old is not None and count['arrays'] > old:
+                regressions.append(f"{name}.temporaries[{label}]: {old} -> {count['arrays']} arrays")
+    return regressions
+
+
+def print_report(results):
+    print("=" * 70)
+    print("MEMORY BENCHMARK")
+    print("=" * 70)
+    print(f"{'Stage':<18} {'Time (s)':>9} {'Traced peak':>12} {'RSS growth':>11} {'RSS peak':>10}")
+    print("-" * 70)
+    for name, result in results.items():
+        if 'error' in result:
+            print(f"{name:<18} ERROR: {result['error']}")
+            continue
+
+        def mb(key):
+            value = result.get(key)
+            return f"{value / 1e6:.1f} MB" if value is not None else "N/A"
+
+        print(f"{name:<18} {result['seconds']:>9.3f} {mb('traced_peak_bytes'):>12} "
+              f"{mb('rss_growth_bytes'):>11} {mb('rss_peak_bytes'):>10}")
+
+    temporaries = results.get('classify_single', {}).get('temporaries')
+    if temporaries:
+        print("\nTemporary arrays per classification:")
+        for label, count in temporaries.items():
+            print(f"  {label:<12} {count['arrays']:>3} arrays  {count['bytes'] / 1e3:>9.1f} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak-memory and allocation regression suite")
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH,
+                        help="Baseline JSON (default: %(default)s)")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Store this run as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="Relative growth allowed (default: %(default)s)")
+    parser.add_argument('--run-stage', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        print(json.dumps(run_stage(args.run_stage)))
+        return
+
+    results = run_all()
+    print_report(results)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Baseline saved: {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"\n⚠ No baseline at {args.baseline}; run with --save-baseline first")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    print()
+    if regressions:
+        print("❌ MEMORY REGRESSIONS")
+        for message in regressions:
+            print(f"  ✗ {message}")
+        sys.exit(1)
+    print("✅ No memory regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Incremental model update from newly labelled recordings.
+New recordings are laid out like Yaseen_Khan (one folder per class). Only
+files not already in the training feature cache are read; their rows are
+appended to training_features.npz. The forest then grows extra trees on
+all cached rows via warm_start, and a new versioned artifact is written
+with its lineage (parent version and hash, files added, tree counts).
+
+A base model's training files are the bundled recordings it was first
+seeded with plus every file listed in its lineage; anything else passed in
+(or added under Yaseen_Khan/ later) is new for this update. Versions are
+numbered past the highest artifact already in models/, which is never
+overwritten.
+
+The existing trees were fitted on features scaled by the model's scaler,
+so the scaler stays frozen during incremental updates. When a new batch
+drifts too far from the scaler's statistics, a full rebuild (--rebuild)
+refits the scaler and a fresh forest from the cached features.
+
+Usage:
+    python3 model_update.py new_recordings/                 # add 20 trees
+    python3 model_update.py new_recordings/ --trees 40 --promote
+    python3 model_update.py --rebuild --promote             # refit scaler and forest
+"""
+
+import argparse
+import os
+import pickle
+import re
+import sys
+import time
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import audio_pipeline
+
+REPO_ROOT = Path(__file__).parent
+DATASET_PATH = REPO_ROOT / "Yaseen_Khan"
+FEATURE_CACHE_PATH = Path(__file__).parent / "training_features.npz"
+MODELS_DIR = Path(__file__).parent / "models"
+
+TREES_PER_UPDATE = 20
+# Mean |batch mean - scaler mean| / scaler scale; random batches of the
+# bundled data stay near 0.1-0.15 (a per-feature std test is too noisy for
+# small single-class batches)
+DRIFT_MEAN_Z = 0.5
+
+
+def labelled_files(directory):
+    """(path, label) for every WAV under directory/<label>/"""
+    return [(str(p.resolve()), p.parent.name) for p in sorted(Path(directory).glob("*/*.wav"))]
+
+
+def repo_relative(path):
+    """Path as recorded in lineage entries (relative to the repo)"""
+    return os.path.relpath(path, REPO_ROOT)
+
+
+def _save_atomic(path, write, overwrite=True):
+    """
+    Write through a temporary file so a crash never leaves a partial file.
+    With overwrite=False, raises FileExistsError instead of replacing `path`.
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    if overwrite:
+        os.replace(temp_path, path)
+        return
+    try:
+        os.link(temp_path, path)  # Atomic, fails if path exists
+    finally:
+        os.remove(temp_path)
+
+
+class TrainingFeatureCache:
+    """
+    Feature rows with their labels, keyed by file path, size and mtime.
+    Rows seeded from the bundled dataset are flagged: they are the
+    shipped model's training set.
+    """
+
+    def __init__(self, cache_path=FEATURE_CACHE_PATH):
+        self.cache_path = Path(cache_path)
+        self.keys = []
+        self.labels = []
+        self.seeded = []
+        self.features = np.empty((0, audio_pipeline.DEFAULT_FEATURES))
+        if self.cache_path.exists():
+            with np.load(self.cache_path) as stored:
+                self.keys = [tuple(k) for k in stored['keys'].tolist()]
+                self.labels = stored['labels'].tolist()
+                self.features = stored['features']
+                if 'seeded' in stored.files:
+                    self.seeded = stored['seeded'].tolist()
+                else:
+                    # Older caches: everything bundled at the time was the seed
+                    bundled = str(DATASET_PATH.resolve())
+                    self.seeded = [k[0].startswith(bundled) for k in self.keys]
+
+    @staticmethod
+    def key(path):
+        stat = os.stat(path)
+        return (path, str(stat.st_size), str(stat.st_mtime_ns))
+
+    def add(self, files, feature_shape, seed=False):
+        """
+        Extract and append rows for files not cached yet. Returns the
+        extracted (path, label)s and the (path, SignalQualityError)s of
+        files the quality gate rejected (those are not cached).
+        """
+        known = set(self.keys)
+        new, rows, rejected = [], [], []
+        for path, label in files:
+            if self.key(path) in known:
+                continue
+            try:
+                rows.append(audio_pipeline.extract_features(path, feature_shape))
+            except audio_pipeline.SignalQualityError as e:
+                rejected.append((path, e))
+                continue
+            new.append((path, label))
+        if not new:
+            return [], rejected
+        rows = np.vstack(rows)
+        self.keys.extend(self.key(path) for path, _ in new)
+        self.labels.extend(label for _, label in new)
+        self.seeded.extend([seed] * len(new))
+        self.features = np.vstack([self.features.reshape(-1, rows.shape[1]), rows])
+        return new, rejected
+
+    def seed_files(self):
+        """Repo-relative paths of the seeded (shipped model) recordings"""
+        return {repo_relative(k[0]) for k, seeded in zip(self.keys, self.seeded) if seeded}
+
+    def rows_for(self, paths):
+        """Index of the current row of each cached path (latest size/mtime), in order"""
+        latest = {repo_relative(k[0]): i for i, k in enumerate(self.keys)}
+        return [latest[p] for p in paths if p in latest]
+
+    def save(self):
+        _save_atomic(self.cache_path, lambda f: np.savez(
+            f, keys=np.array(self.keys, dtype=str).reshape(-1, 3),
+            labels=np.array(self.labels, dtype=str), features=self.features,
+            seeded=np.array(self.seeded, dtype=bool)))
+
+
+def scaler_drift(scaler, rows):
+    """Mean |z| of the batch's feature means against the frozen scaler"""
+    return float(np.mean(np.abs(rows.mean(axis=0) - scaler.mean_) / scaler.scale_))
+
+
+def next_artifact_path(version, models_dir=MODELS_DIR):
+    return Path(models_dir) / f"heart_sound_rf_model_v{version}.pkl"
+
+
+def next_version(model, models_dir=MODELS_DIR):
+    """One past both the base model's version and every artifact in models_dir"""
+    existing = [int(m.group(1)) for p in Path(models_dir).glob("heart_sound_rf_model_v*.pkl")
+                if (m := re.fullmatch(r"heart_sound_rf_model_v(\d+)\.pkl", p.name))]
+    return max([model['version'] or 0] + existing) + 1
+
+
+def trained_files(model, cache):
+    """Repo-relative paths the base model was trained on: seed set plus lineage"""
+    files = cache.seed_files()
+    for entry in model['lineage'] or []:
+        files.update(entry.get('files_added', []))
+    return files
+
+
+def update_model(model, features, labels, new_rows, trees=TREES_PER_UPDATE, rebuild=False):
+    """
+    Grow (or, with rebuild, refit) the forest on the given rows: the base
+    model's training rows plus the new ones flagged by the boolean
+    `new_rows`. Returns (classifier, scaler, details dict for the lineage entry).
+    """
+    from sklearn.base import clone
+    from sklearn.preprocessing import StandardScaler
+
+    label_encoder = model['label_encoder']
+    unknown = sorted(set(labels) - set(label_encoder.classes_))
+    if unknown:
+        raise ValueError(f"Unknown class(es) {', '.join(unknown)}: the label set is fixed "
+                         "for incremental updates")
+    y = label_encoder.transform(labels)
+    details = {}
+
+    if new_rows.any() and not rebuild:
+        # Old-model accuracy on the new batch, before it learns from it
+        batch = features[new_rows]
+        predicted = [label for label, _ in audio_pipeline.predict(model, batch)]
+        details['batch_accuracy_before'] = float(np.mean(
+            np.array(predicted) == np.asarray(labels)[new_rows]))
+        details['scaler_drift'] = scaler_drift(model['scaler'], batch)
+
+    start = time.perf_counter()
+    if rebuild:
+        scaler = StandardScaler().fit(features)
+        classifier = clone(model['classifier'])
+        classifier.set_params(warm_start=False)
+        classifier.fit(scaler.transform(features), y)
+        details['scaler'] = 'refit'
+    else:
+        scaler = model['scaler']
+        classifier = model['classifier']
+        classifier.set_params(warm_start=True,
+                              n_estimators=len(classifier.estimators_) + trees)
+        classifier.fit(scaler.transform(features), y)
+        classifier.set_params(warm_start=False)
+        details['scaler'] = 'frozen'
+    details['fit_seconds'] = time.perf_counter() - start
+    return classifier, scaler, details
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the model with new labelled recordings")
+    parser.add_argument('data_dirs', nargs='*', type=Path,
+                        help="Directories with one sub-folder of WAVs per class")
+    parser.add_argument('--base', type=Path, default=audio_pipeline.MODEL_PATH,
+                        help="Model to update (default: %(default)s)")
+    parser.add_argument('--trees', type=int, default=TREES_PER_UPDATE,
+                        help="Trees to add (default: %(default)s)")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Refit the scaler and a fresh forest on the base and new rows")
+    parser.add_argument('--promote', action='store_true',
+                        help=f"Also install the new version as {audio_pipeline.MODEL_PATH.name}")
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    model = audio_pipeline.load_model(args.base)
+    if model['scaler'] is None or model['label_encoder'] is None:
+        print("✗ Base model has no scaler/label encoder; cannot update incrementally")
+        sys.exit(1)
+
+    # The bundled dataset, as first seeded, is what the shipped model was trained on
+    cache = TrainingFeatureCache()
+    start = time.perf_counter()
+    seeding = not cache.keys
+    seeded, rejected = cache.add(labelled_files(DATASET_PATH), model['feature_shape'],
+                                 seed=seeding)
+    candidates = list(labelled_files(DATASET_PATH))
+    for directory in args.data_dirs:
+        candidates += labelled_files(directory)
+        rejected += cache.add(labelled_files(directory), model['feature_shape'])[1]
+    extract_seconds = time.perf_counter() - start
+    if seeding and seeded:
+        print(f"✓ Seeded feature cache with {len(seeded)} bundled recordings")
+    if rejected:
+        print(f"⚠ Skipped {len(rejected)} recordings that failed the signal-quality check:")
+        for path, error in rejected:
+            print(f"  ✗ {repo_relative(path)}: {error}")
+        skipped = {path for path, _ in rejected}
+        candidates = [(path, label) for path, label in candidates if path not in skipped]
+
+    trained = trained_files(model, cache)
+    new_files = list(dict.fromkeys(repo_relative(path) for path, _ in candidates
+                                   if repo_relative(path) not in trained))
+    if not new_files and not args.rebuild:
+        cache.save()
+        print("✓ No new recordings; model unchanged")
+        return
+    base_rows = cache.rows_for(sorted(trained))
+    if len(base_rows) < len(trained):
+        print(f"⚠ {len(trained) - len(base_rows)} training files of the base model are not "
+              "in the feature cache (pass their folders again to include them)")
+    rows = base_rows + cache.rows_for(new_files)
+    features = cache.features[rows]
+    labels = [cache.labels[i] for i in rows]
+    new_rows = np.arange(len(rows)) >= len(base_rows)
+    print(f"✓ {len(new_files)} new recordings ({extract_seconds:.1f}s extracting), "
+          f"training on {len(rows)} rows")
+
+    previous_trees = len(model['classifier'].estimators_)
+    try:
+        classifier, scaler, details = update_model(model, features, labels, new_rows,
+                                                   args.trees, args.rebuild)
+    except ValueError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+    if 'scaler_drift' in details:
+        drifted = details['scaler_drift'] > DRIFT_MEAN_Z
+        print(f"{'⚠' if drifted else '✓'} Scaler drift: mean shift {details['scaler_drift']:.2f} sd"
+              + (" - run with --rebuild to refit the scaler" if drifted else ""))
+        print(f"✓ Previous model on new batch: "
+              f"{100 * details['batch_accuracy_before']:.1f}% correct")
+
+    version = next_version(model)
+    lineage = list(model['lineage'] or [])
+    entry = {
+        'version': version,
+        'parent': str(args.base),
+        'parent_version': model['version'] or 0,
+        'parent_sha256': audio_pipeline.file_sha256(args.base),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'kind': 'rebuild' if args.rebuild else 'warm_start',
+        'files_added': new_files,
+        'rows_total': len(rows),
+        'trees_before': previous_trees,
+        'trees_after': len(classifier.estimators_),
+        # No holdout is kept, so the updated forest's accuracy is unknown
+        'accuracy_evaluated': False,
+        **{k: v for k, v in details.items() if k != 'fit_seconds'},
+    }
+    artifact = {
+        'classifier': classifier,
+        'scaler': scaler,
+        'label_encoder': model['label_encoder'],
+        'feature_shape': model['feature_shape'],
+        'accuracy': None,  # The parent's figure does not apply to this forest
+        'version': version,
+        'lineage': lineage + [entry],
+    }
+
+    MODELS_DIR.mkdir(exist_ok=True)
+    while True:
+        # Never overwrite an artifact, even one written by a concurrent run
+        entry['version'] = artifact['version'] = version
+        artifact['lineage'] = lineage + [entry]
+        artifact_path = next_artifact_path(version)
+        try:
+            _save_atomic(artifact_path, lambda f: pickle.dump(artifact, f), overwrite=False)
+            break
+        except FileExistsError:
+            version += 1
+    cache.save()
+    print(f"✓ Version {version}: {previous_trees} → {len(classifier.estimators_)} trees, "
+          f"fit in {details['fit_seconds']:.1f}s")
+    print(f"✓ Written: {artifact_path}")
+    if args.promote:
+        _save_atomic(audio_pipeline.MODEL_PATH, lambda f: pickle.dump(artifact, f))
+        print(f"✓ Promoted to {audio_pipeline.MODEL_PATH.name}")
+
+
+if __name__ == "__main__":
+    main()
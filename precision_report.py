@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Measured float32 vs float64 report.
+Runs every bundled recording through the float64 (training) and float32
+pipelines and reports per-file latency, traced peak memory per
+classification and prediction agreement.
+
+Usage:
+    python3 precision_report.py [--every 5] [--repeat 3]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+import audio_pipeline
+from golden_features import DATASET_PATH, dataset_files, load_quiet_model
+
+
+def classify_with(model, path, precision):
+    """
+    Features, class probabilities and (extract, inference) seconds for one
+    file at `precision`
+    """
+    start = time.perf_counter()
+    features = audio_pipeline.extract_features(path, model['feature_shape'], precision)
+    extracted = time.perf_counter()
+    scaled = features
+    if model['scaler'] is not None:
+        scaled = model['scaler'].transform(np.asarray(features, dtype=np.float64))
+    proba = model['classifier'].predict_proba(scaled)[0]
+    return features, proba, (extracted - start, time.perf_counter() - extracted)
+
+
+def measure_precision(model, paths, precision, repeat):
+    """Per-file timings (best of `repeat`), traced peaks and probabilities"""
+    times, peaks, features, probabilities = [], [], [], []
+    for path in paths:
+        best = (float('inf'), float('inf'))
+        for _ in range(repeat):
+            _, _, elapsed = classify_with(model, path, precision)
+            best = (min(best[0], elapsed[0]), min(best[1], elapsed[1]))
+        times.append(best)
+
+        # Memory of the feature path only; inference is precision-agnostic
+        tracemalloc.start()
+        audio_pipeline.extract_features(path, model['feature_shape'], precision)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        row, proba, _ = classify_with(model, path, precision)
+        features.append(row[0])
+        probabilities.append(proba)
+    return np.array(times), np.array(peaks), np.array(features), np.array(probabilities)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare float32 and float64 processing")
+    parser.add_argument('--every', type=int, default=1,
+                        help="Use every Nth bundled file (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Timing repetitions per file, best kept (default: %(default)s)")
+    args = parser.parse_args()
+
+    model = load_quiet_model()
+    root = DATASET_PATH.parent
+    paths = [str(root / name) for name in dataset_files()[::args.every]]
+
+    results = {}
+    for precision in ('float64', 'float32'):
+        results[precision] = measure_precision(model, paths, precision, args.repeat)
+
+    print("=" * 70)
+    print(f"PRECISION REPORT ({len(paths)} files)")
+    print("=" * 70)
+    print(f"{'Precision':<10} {'Extract (ms)':>13} {'Inference (ms)':>15} "
+          f"{'Total p95 (ms)':>15} {'Extract peak (KB)':>18}")
+    print("-" * 70)
+    for precision, (times, peaks, _, _) in results.items():
+        print(f"{precision:<10} {1000 * np.median(times[:, 0]):>13.2f} "
+              f"{1000 * np.median(times[:, 1]):>15.2f} "
+              f"{1000 * np.percentile(times.sum(axis=1), 95):>15.2f} "
+              f"{np.median(peaks) / 1e3:>18.1f}")
+
+    t64, p64, f64, prob64 = results['float64']
+    t32, p32, f32, prob32 = results['float32']
+    agree = np.argmax(prob64, axis=1) == np.argmax(prob32, axis=1)
+    print("-" * 70)
+    print("Medians; Extract = read through DWT, Inference = scaler + forest")
+    print(f"Extract speed-up:         {np.median(t64[:, 0]) / np.median(t32[:, 0]):.2f}x")
+    print(f"Inference speed-up:       {np.median(t64[:, 1]) / np.median(t32[:, 1]):.2f}x")
+    print(f"Peak memory ratio:        {np.median(p32) / np.median(p64):.2f}")
+    print(f"Max feature difference:   {np.max(np.abs(f64 - f32)):.3g}")
+    print(f"Max probability change:   {np.max(np.abs(prob64 - prob32)):.3g}")
+    print(f"Label agreement:          {100 * agree.mean():.2f}% "
+          f"({int((~agree).sum())} of {len(paths)} differ)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+On-demand profiling of the classification path.
+When enabled, the next N classifications run under cProfile and tracemalloc
+and each one writes a .prof file plus a JSON allocation summary. When
+disabled, profile_classification() hands back a shared no-op context, so the
+pipeline runs exactly as before.
+
+Enable with the environment variables
+    HEART_PROFILE=5 HEART_PROFILE_DIR=profiles python3 heart_sound_classifier.py
+or the GUI flag
+    python3 heart_sound_classifier.py --profile 5
+
+N is a budget for the whole session: worker processes (e.g. the
+hot-folder pool) inherit it through the environment and share it, so
+HEART_PROFILE=3 writes three profiles however many processes classify.
+
+Summarize collected runs by pipeline stage:
+    python3 profiling.py [profiles]
+"""
+
+import argparse
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+PROFILE_ENV = 'HEART_PROFILE'          # Number of classifications to profile
+PROFILE_DIR_ENV = 'HEART_PROFILE_DIR'  # Output directory
+PROFILE_SESSION_ENV = 'HEART_PROFILE_SESSION'  # Shared by a process and its workers
+DEFAULT_PROFILE_DIR = Path(__file__).parent / "profiles"
+TOP_ALLOCATIONS = 15
+PEAK_SAMPLE_SECONDS = 0.001  # How often the peak sampler checks traced memory
+
+# Pipeline stages as (stage, path fragment, function name) matched in pstats
+STAGES = [
+    ('read', 'scipy/io/wavfile', 'read'),
+    ('convert', 'audio_pipeline', 'to_float'),
+    ('resample', 'scipy/signal', 'resample'),
+    ('highpass', 'scipy/signal', 'filtfilt'),
+    ('dwt', 'pywt', 'wavedec'),
+    ('scale', 'sklearn/preprocessing', 'transform'),
+    ('forest', 'sklearn/ensemble', 'predict_proba'),
+]
+
+_NULL_CONTEXT = contextlib.nullcontext()
+_profiler = None
+
+
+class PeakSampler(threading.Thread):
+    """
+    Snapshots traced memory each time it reaches a new high while a block
+    runs, so the top allocations describe the peak (resample and filter
+    temporaries included) rather than what is still alive afterwards
+    """
+
+    def __init__(self, interval=PEAK_SAMPLE_SECONDS):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.snapshot = None
+        self.size = 0
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        current, _ = tracemalloc.get_traced_memory()
+        if current > self.size:
+            self.snapshot = None  # Free the previous snapshot first
+            self.snapshot = tracemalloc.take_snapshot()
+            self.size = current
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.sample()  # The block's final state may be the highest
+        return self.snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, threading.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+
+
+class ClassificationProfiler:
+    """
+    Profiles the next `runs` classifications of this session into
+    `out_dir`. Runs are claimed with exclusive slot files, so every process
+    sharing the session draws from the same budget.
+    """
+
+    def __init__(self, runs, out_dir=DEFAULT_PROFILE_DIR, session=None):
+        self.runs = runs
+        self.remaining = runs
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.session = session or f"{os.getpid()}-{time.time_ns()}"
+        self.count = 0
+
+    def claim(self):
+        """Take one of the session's runs; False once all are taken"""
+        slots = self.out_dir / ".slots"
+        slots.mkdir(exist_ok=True)
+        for slot in range(self.runs):
+            try:
+                os.close(os.open(slots / f"{self.session}_{slot}",
+                                 os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                continue
+        self.remaining = 0
+        return False
+
+    @contextlib.contextmanager
+    def run(self, label):
+        """Profile the enclosed block as one classification"""
+        self.count += 1
+        name = f"{datetime.now():%Y%m%d-%H%M%S}_{os.getpid()}_{self.count:03d}_{_safe_name(label)}"
+
+        profile = cProfile.Profile()
+        tracemalloc.start()
+        sampler = PeakSampler()
+        sampler.start()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            wall = time.perf_counter() - start
+            snapshot = sampler.stop()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            profile.dump_stats(str(self.out_dir / f"{name}.prof"))
+            allocations = [
+                {
+                    'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    'size_bytes': stat.size,
+                    'count': stat.count,
+                }
+                for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+            ]
+            summary = {
+                'label': label,
+                'wall_seconds': wall,
+                'peak_bytes': peak,
+                'sampled_peak_bytes': sampler.size,  # Traced memory when snapshotted
+                'top_allocations': allocations,
+            }
+            with open(self.out_dir / f"{name}.json", 'w') as f:
+                json.dump(summary, f, indent=2)
+            print(f"Profile written: {self.out_dir / name}.prof ({wall:.3f}s, peak {peak / 1e6:.1f} MB)")
+
+
+def _safe_name(label):
+    """File-system safe version of a run label"""
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(label))[:60] or 'run'
+
+
+def configure(runs=None, out_dir=None):
+    """
+    Enable profiling for the next `runs` classifications. With no
+    arguments, read HEART_PROFILE / HEART_PROFILE_DIR from the environment.
+    The settings and session are exported so worker processes share the
+    same budget instead of each profiling `runs` classifications.
+    """
+    global _profiler
+    if runs is None:
+        try:
+            runs = int(os.environ.get(PROFILE_ENV, '0'))
+        except ValueError:
+            runs = 0
+    if out_dir is None:
+        out_dir = os.environ.get(PROFILE_DIR_ENV, DEFAULT_PROFILE_DIR)
+    if runs <= 0:
+        _profiler = None
+        return
+    session = os.environ.get(PROFILE_SESSION_ENV)
+    _profiler = ClassificationProfiler(runs, out_dir, session)
+    os.environ.update({PROFILE_ENV: str(runs), PROFILE_DIR_ENV: str(out_dir),
+                       PROFILE_SESSION_ENV: _profiler.session})
+
+
+def profile_classification(label):
+    """Context manager around one classification (no-op when disabled)"""
+    if _profiler is None:
+        return _NULL_CONTEXT
+    if _profiler.remaining <= 0 or not _profiler.claim():
+        return _NULL_CONTEXT
+    return _profiler.run(label)
+
+
+def stage_times(prof_path):
+    """Cumulative seconds per pipeline stage in one .prof file"""
+    stats = pstats.Stats(str(prof_path)).stats
+    times = {stage: 0.0 for stage, _, _ in STAGES}
+    for (filename, _, funcname), (_, _, _, cumulative, _) in stats.items():
+        filename = filename.replace('\\', '/')
+        for stage, fragment, name in STAGES:
+            if funcname == name and fragment in filename:
+                times[stage] += cumulative
+    return times
+
+
+def summarize(profile_dir):
+    """Print per-stage timings and memory peaks aggregated over all runs"""
+    profile_dir = Path(profile_dir)
+    prof_files = sorted(profile_dir.glob("*.prof"))
+    if not prof_files:
+        print(f"No .prof files found in {profile_dir}")
+        return 1
+
+    per_stage = {stage: [] for stage, _, _ in STAGES}
+    per_stage['other'] = []
+    walls, peaks = [], []
+    allocations = {}
+    for prof_path in prof_files:
+        times = stage_times(prof_path)
+        summary_path = prof_path.with_suffix('.json')
+        wall = sum(times.values())
+        if summary_path.exists():
+            with open(summary_path) as f:
+                summary = json.load(f)
+            wall = summary['wall_seconds']
+            peaks.append(summary['peak_bytes'])
+            for alloc in summary['top_allocations']:
+                allocations[alloc['location']] = allocations.get(alloc['location'], 0) + alloc['size_bytes']
+        walls.append(wall)
+        for stage, seconds in times.items():
+            per_stage[stage].append(seconds)
+        per_stage['other'].append(max(0.0, wall - sum(times.values())))
+
+    total = sum(walls)
+    print("=" * 60)
+    print(f"PROFILE SUMMARY ({len(prof_files)} runs in {profile_dir})")
+    print("=" * 60)
+    print(f"{'Stage':<12} {'Mean (ms)':>10} {'Max (ms)':>10} {'Share':>8}")
+    print("-" * 60)
+    for stage, values in per_stage.items():
+        mean_ms = 1000 * sum(values) / len(values)
+        share = 100 * sum(values) / total if total > 0 else 0.0
+        print(f"{stage:<12} {mean_ms:>10.1f} {1000 * max(values):>10.1f} {share:>7.1f}%")
+    print("-" * 60)
+    print(f"{'total':<12} {1000 * total / len(walls):>10.1f} {1000 * max(walls):>10.1f}")
+
+    if peaks:
+        print(f"\nPeak traced memory: mean {sum(peaks) / len(peaks) / 1e6:.1f} MB, "
+              f"max {max(peaks) / 1e6:.1f} MB")
+        print("\nTop allocation sites at peak (summed over runs):")
+        top = sorted(allocations.items(), key=lambda item: item[1], reverse=True)[:10]
+        for location, size in top:
+            print(f"  {size / 1e6:>8.2f} MB  {location}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize classification profiles by stage")
+    parser.add_argument('profile_dir', nargs='?',
+                        default=os.environ.get(PROFILE_DIR_ENV, DEFAULT_PROFILE_DIR),
+                        help="Directory of .prof/.json files (default: %(default)s)")
+    args = parser.parse_args()
+    sys.exit(summarize(args.profile_dir))
+
+
+configure()
+
+if __name__ == "__main__":
+    main()
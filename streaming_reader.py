@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Chunked streaming reader for very long PCG recordings.
+Reads the WAV in fixed-size chunks and resamples/filters each chunk with
+carried state, so peak memory stays constant no matter how long the file is.
+
+Usage:
+    python3 streaming_reader.py long_recording.wav [--chunk-seconds 10] [--hop-seconds 3]
+"""
+
+import argparse
+import sys
+from collections import Counter
+from math import gcd
+
+import numpy as np
+from scipy.io import wavfile
+from scipy import signal
+
+import audio_pipeline
+
+CHUNK_SECONDS = 10        # Raw audio read per step
+FILTER_MARGIN = 500       # Look-ahead (1 kHz samples) for the backward filter pass
+
+
+def iter_chunks(audio_path, chunk_seconds=CHUNK_SECONDS):
+    """
+    Yield (sr, chunk) for consecutive float32 mono chunks of a WAV file.
+    The file is memory-mapped, so only one chunk is ever converted to float.
+    """
+    sr, audio = wavfile.read(audio_path, mmap=True)
+    yield from _float_chunks(audio, sr, chunk_seconds)
+
+
+def _float_chunks(audio, sr, chunk_seconds):
+    chunk_frames = max(1, int(chunk_seconds * sr))
+    for start in range(0, len(audio), chunk_frames):
+        chunk = audio_pipeline.first_channel(audio[start:start + chunk_frames])
+        yield sr, audio_pipeline.to_float(np.asarray(chunk))
+
+
+class ChunkResampler:
+    """
+    Polyphase resampler with overlap handling. Each chunk is resampled with
+    `pad` samples of context on both sides and the edges are discarded, so
+    interior output matches a whole-signal scipy.signal.resample_poly.
+    """
+
+    def __init__(self, sr, target_sr=audio_pipeline.TARGET_SR):
+        g = gcd(int(sr), int(target_sr))
+        self.up = int(target_sr) // g
+        self.down = int(sr) // g
+        # resample_poly's default filter half-length, in input samples,
+        # rounded up to a multiple of `down` so output stays aligned
+        half_len = -(-10 * max(self.up, self.down) // self.up)
+        self.pad = (half_len // self.down + 1) * self.down
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.context = 0  # left-context samples at the start of the buffer
+
+    def process(self, chunk):
+        """Resample one chunk; returns whatever output is final so far"""
+        if self.up == self.down:
+            return chunk
+        buffer = np.concatenate([self.buffer, chunk])
+
+        # Emit a whole number of `down` blocks, holding back `pad` look-ahead
+        core = (len(buffer) - self.pad - self.context) // self.down * self.down
+        if core <= 0:
+            self.buffer = buffer
+            return np.zeros(0, dtype=np.float32)
+
+        segment = buffer[:self.context + core + self.pad]
+        out = signal.resample_poly(segment, self.up, self.down)
+        start = self.context * self.up // self.down
+        out = out[start:start + core * self.up // self.down]
+
+        # Keep `pad` samples of left context for the next chunk
+        next_start = self.context + core
+        keep_from = max(0, next_start - self.pad)
+        self.context = next_start - keep_from
+        self.buffer = buffer[keep_from:]
+        return out
+
+    def flush(self):
+        """Resample whatever is left at the end of the stream"""
+        if self.up == self.down or len(self.buffer) <= self.context:
+            return np.zeros(0, dtype=np.float32)
+        out = signal.resample_poly(self.buffer, self.up, self.down)
+        self.buffer = np.zeros(0, dtype=np.float32)
+        return out[self.context * self.up // self.down:]
+
+
+class ChunkHighpass:
+    """
+    Zero-phase Butterworth high-pass for streams. The forward pass runs
+    causally with carried state; the backward pass is applied per window
+    with FILTER_MARGIN samples of look-ahead, approximating filtfilt.
+    """
+
+    def __init__(self):
+        self.sos = audio_pipeline.highpass_coefficients(output='sos')
+        self.zi = None
+
+    def forward(self, chunk):
+        """Causal forward pass with state carried across chunks"""
+        if len(chunk) == 0:
+            return chunk
+        if self.zi is None:
+            self.zi = signal.sosfilt_zi(self.sos) * chunk[0]
+        out, self.zi = signal.sosfilt(self.sos, chunk, zi=self.zi)
+        return out
+
+    def backward(self, forward_samples, length):
+        """
+        Backward pass over `forward_samples`, returning the first `length`
+        samples (the rest is look-ahead that absorbs the start-up transient)
+        """
+        reversed_out = signal.sosfilt(self.sos, forward_samples[::-1])
+        return reversed_out[::-1][:length]
+
+
+def stream_features(audio_path, feature_shape=None, chunk_seconds=CHUNK_SECONDS,
+                    hop=audio_pipeline.TARGET_LENGTH):
+    """
+    Generator yielding (start_seconds, features, rejection) for each
+    3-second window of a recording, with features shaped (1, feature_shape).
+    Each window's raw samples pass check_quality first; a rejected window
+    yields features None and the SignalQualityError (filtering carries on,
+    so later windows are unaffected).
+
+    Windows are normalized individually (z-score over the window) since the
+    whole-recording statistics are not known while streaming. A trailing
+    partial window is only emitted (zero-padded) for recordings shorter than
+    one window, matching extract_features.
+    """
+    window = audio_pipeline.TARGET_LENGTH
+    sr, raw = wavfile.read(audio_path, mmap=True)
+    raw_window = int(round(window * sr / audio_pipeline.TARGET_SR))
+    resampler = None
+    highpass = ChunkHighpass()
+
+    filtered = np.zeros(0)   # forward-filtered 1 kHz samples from `offset`
+    offset = 0               # 1 kHz index of filtered[0]
+    emitted = 0
+
+    def ready_windows(final):
+        nonlocal filtered, offset, emitted
+        while True:
+            start = emitted * hop
+            local = start - offset
+            available = len(filtered) - local
+            if available >= window + FILTER_MARGIN or (final and available >= window):
+                segment = filtered[local:local + window + FILTER_MARGIN]
+            elif final and emitted == 0 and available > 0:
+                segment = filtered[local:]
+            else:
+                break
+
+            start_seconds = start / audio_pipeline.TARGET_SR
+            raw_start = int(round(start_seconds * sr))
+            try:
+                audio_pipeline.check_quality(audio_pipeline.first_channel(
+                    np.asarray(raw[raw_start:raw_start + raw_window])), sr)
+            except audio_pipeline.SignalQualityError as e:
+                yield start_seconds, None, e
+            else:
+                samples = highpass.backward(segment, window)
+                std = np.std(samples)
+                if std > 0:
+                    samples = (samples - np.mean(samples)) / std
+                samples = audio_pipeline.fit_length(samples, window)
+                yield start_seconds, audio_pipeline.dwt_features(samples, feature_shape), None
+            emitted += 1
+
+            # Drop samples no later window needs
+            drop = emitted * hop - offset
+            if drop > 0:
+                filtered = filtered[drop:]
+                offset += drop
+
+    for sr, chunk in _float_chunks(raw, sr, chunk_seconds):
+        if resampler is None:
+            resampler = ChunkResampler(sr)
+        resampled = resampler.process(chunk)
+        filtered = np.concatenate([filtered, highpass.forward(resampled)])
+        yield from ready_windows(final=False)
+
+    if resampler is not None:
+        filtered = np.concatenate([filtered, highpass.forward(resampler.flush())])
+    yield from ready_windows(final=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify a long recording window by window")
+    parser.add_argument('audio_path', help="WAV file to classify")
+    parser.add_argument('--chunk-seconds', type=float, default=CHUNK_SECONDS,
+                        help="Raw audio read per step (default: %(default)s)")
+    parser.add_argument('--hop-seconds', type=float, default=3.0,
+                        help="Step between 3-second windows (default: %(default)s)")
+    args = parser.parse_args()
+
+    model = audio_pipeline.load_model()
+    hop = max(1, int(args.hop_seconds * audio_pipeline.TARGET_SR))
+    votes = Counter()
+    rejected = Counter()
+
+    print(f"{'Start (s)':<12} {'Prediction':<12} {'Confidence':<12}")
+    print("-" * 36)
+    try:
+        for start, features, rejection in stream_features(args.audio_path, model['feature_shape'],
+                                                          args.chunk_seconds, hop):
+            if rejection is not None:
+                rejected[rejection.reason] += 1
+                print(f"{start:<12.1f} {'rejected':<12} {rejection}")
+                continue
+            label, confidence = audio_pipeline.predict(model, features)[0]
+            votes[label] += 1
+            conf_text = f"{confidence:.1f}%" if confidence is not None else "N/A"
+            print(f"{start:<12.1f} {label:<12} {conf_text:<12}")
+    except Exception as e:
+        print(f"ERROR: Streaming failed: {e}")
+        sys.exit(1)
+
+    print("-" * 36)
+    if rejected:
+        reasons = ", ".join(f"{reason} {count}" for reason, count in rejected.most_common())
+        print(f"Rejected: {sum(rejected.values())} windows ({reasons})")
+    if not votes:
+        print("ERROR: No window passed the signal-quality check")
+        sys.exit(1)
+    label, count = votes.most_common(1)[0]
+    print(f"Majority: {label} ({count}/{sum(votes.values())} windows)")
+
+
+if __name__ == "__main__":
+    main()
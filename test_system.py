@@ -2,12 +2,28 @@
 """
 Test script to verify model and dependencies
 Run this before deploying to Raspberry Pi
+
+Checks the adaptive quality mode against a fake /sys and /proc tree, and
+ends with a latency-budget check of the real pipeline (extract_features +
+forest): first call (in a fresh process, so it is really cold) and steady
+state against the budgets below.
+
+Usage:
+    python3 test_system.py [--budget-ms 1000] [--first-call-budget-ms 3000]
 """
 
+import argparse
+import json
+import subprocess
 import sys
-import os
+import time
+import warnings
 from pathlib import Path
 
+# Latency budgets per classification (Raspberry Pi 5 targets)
+STEADY_BUDGET_MS = 1000
+FIRST_CALL_BUDGET_MS = 3000
+
 def test_imports():
     """Test if all required packages are available"""
     print("Testing imports...")
@@ -20,10 +36,16 @@ def test_imports():
         errors.append(f"✗ numpy: {e}")
     
     try:
-        import librosa
-        print("✓ librosa:", librosa.__version__)
+        import scipy
+        print("✓ scipy:", scipy.__version__)
+    except ImportError as e:
+        errors.append(f"✗ scipy: {e}")
+    
+    try:
+        import pywt
+        print("✓ PyWavelets:", pywt.__version__)
     except ImportError as e:
-        errors.append(f"✗ librosa: {e}")
+        errors.append(f"✗ PyWavelets: {e}")
     
     try:
         import sklearn
@@ -50,9 +72,10 @@ def test_model():
     print(f"✓ Model file found: {model_path}")
     
     try:
-        import pickle
-        with open(model_path, 'rb') as f:
-            model = pickle.load(f)
+        import audio_pipeline
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            model = audio_pipeline.load_model(model_path)['classifier']
         print(f"✓ Model loaded successfully (type: {type(model).__name__})")
         
         # Check if it has predict method
@@ -93,47 +116,115 @@ def test_dataset():
     
     return errors
 
-def test_audio_processing():
-    """Test audio file processing"""
-    print("\nTesting audio processing...")
-    dataset_path = Path(__file__).parent / "Yaseen_Khan"
-    
-    # Find first WAV file
-    test_file = None
-    for cat in ['N', 'AS', 'MR', 'MS', 'MVP']:
-        cat_path = dataset_path / cat
-        if cat_path.exists():
-            wav_files = list(cat_path.glob("*.wav"))
-            if wav_files:
-                test_file = wav_files[0]
-                break
-    
-    if not test_file:
-        return ["⚠ No WAV files found for testing"]
+def test_adaptive_mode():
+    """Check throttling detection and mode choice against a fake /sys and /proc"""
+    print("\nTesting adaptive quality mode...")
+    import os
+    import tempfile
+    import adaptive_quality
     
-    print(f"Testing with: {test_file.name}")
+    def fake_root(root, cur_khz, max_khz, temp_milli, load):
+        cpufreq = Path(root) / "sys/devices/system/cpu/cpu0/cpufreq"
+        thermal = Path(root) / "sys/class/thermal/thermal_zone0"
+        for folder in [cpufreq, thermal, Path(root) / "proc"]:
+            folder.mkdir(parents=True, exist_ok=True)
+        (cpufreq / "scaling_cur_freq").write_text(f"{cur_khz}\n")
+        (cpufreq / "cpuinfo_max_freq").write_text(f"{max_khz}\n")
+        (thermal / "temp").write_text(f"{temp_milli}\n")
+        (Path(root) / "proc/loadavg").write_text(f"{load} 0.00 0.00 1/100 1234\n")
     
-    try:
-        import librosa
-        import numpy as np
-        
-        # Load audio
-        y, sr = librosa.load(str(test_file), sr=None)
-        print(f"✓ Audio loaded: {len(y)} samples at {sr} Hz ({len(y)/sr:.2f} seconds)")
+    adaptive = adaptive_quality.AdaptiveClassifier(model=None, latency_target=1.0)
+    errors = []
+    with tempfile.TemporaryDirectory() as root:
+        # No sensors at all: no slowdown, and 'full' until something is measured
+        state = adaptive_quality.read_system_state(sys_root=root)
+        if adaptive_quality.slowdown_factor(state) != 1.0:
+            errors.append("✗ Missing sensors should mean no slowdown")
+        if adaptive.choose_mode(state)['name'] != 'full':
+            errors.append("✗ Unmeasured classifier should start in 'full' mode")
         
-        # Extract basic features
-        mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-        print(f"✓ MFCCs extracted: shape {mfccs.shape}")
+        # 'full' measured at 400 ms: max 600, fast 200, economy 120 ms when idle
+        adaptive.base_latency = {'full': 0.4}
+        busy = f"{3 * (os.cpu_count() or 1) - 1:.2f}"  # Three runnable tasks per core
+        cases = [
+            # cur kHz, max kHz, m°C, load, expected slowdown, expected mode
+            (2400000, 2400000, 45000, '0.00', 1.0, 'max'),
+            (1200000, 2400000, 45000, '0.00', 2.0, 'full'),
+            (1600000, 2400000, 82000, '0.00', 1.875, 'full'),
+            (2400000, 2400000, 45000, busy, 3.0, 'fast'),
+            (500000, 2400000, 85000, '0.00', 6.0, 'economy'),
+        ]
+        for cur_khz, max_khz, temp_milli, load, slowdown, mode in cases:
+            fake_root(root, cur_khz, max_khz, temp_milli, load)
+            state = adaptive_quality.read_system_state(sys_root=root)
+            factor = adaptive_quality.slowdown_factor(state)
+            chosen = adaptive.choose_mode(state)['name']
+            summary = adaptive_quality.describe_state(state)
+            if abs(factor - slowdown) > 1e-9 or chosen != mode:
+                errors.append(f"✗ {summary}: slowdown {factor:.2f}, mode {chosen} "
+                              f"(expected {slowdown:.2f}, {mode})")
+            else:
+                print(f"✓ {summary}: slowdown {factor:.2f} -> {chosen}")
+    return errors
+
+def test_latency_budget(steady_budget_ms=STEADY_BUDGET_MS,
+                        first_call_budget_ms=FIRST_CALL_BUDGET_MS):
+    """Time the real pipeline (cold and warm) against the latency budgets"""
+    print("\nTesting latency budget...")
+    try:
+        import audio_pipeline
         
-        spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=sr)
-        print(f"✓ Spectral centroid extracted: shape {spectral_centroid.shape}")
+        # Synthetic recording in a fresh interpreter: the earlier checks have
+        # already imported and loaded everything in this one, so its first
+        # call would not pay the one-off costs
+        proc = subprocess.run([sys.executable, str(Path(__file__).parent / "warmup.py"), '--json'],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'
+            return [f"✗ Cold start failed: {error}"]
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"✓ Model load: {result['load']:.0f} ms (fresh process)")
+        print(f"  First call:   {result['first']:.0f} ms (budget {first_call_budget_ms:g} ms)")
+        print(f"  Steady state: {result['steady']:.0f} ms (budget {steady_budget_ms:g} ms)")
         
-        return []
+        # Real recordings, one per class
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            model = audio_pipeline.load_model()
+        dataset_path = Path(__file__).parent / "Yaseen_Khan"
+        test_files = [sorted((dataset_path / cat).glob("*.wav"))[0]
+                      for cat in ['N', 'AS', 'MR', 'MS', 'MVP']
+                      if list((dataset_path / cat).glob("*.wav"))]
+        times = []
+        for test_file in test_files:
+            start = time.perf_counter()
+            features = audio_pipeline.extract_features(str(test_file), model['feature_shape'])
+            label, confidence = audio_pipeline.predict(model, features)[0]
+            times.append(1000 * (time.perf_counter() - start))
+            print(f"  {test_file.name}: {label} ({confidence:.1f}%) in {times[-1]:.0f} ms")
     except Exception as e:
-        return [f"✗ Audio processing failed: {e}"]
+        return [f"✗ Pipeline failed: {e}"]
+    
+    errors = []
+    if result['first'] > first_call_budget_ms:
+        errors.append(f"✗ First call {result['first']:.0f} ms exceeds {first_call_budget_ms:g} ms")
+    if result['steady'] > steady_budget_ms:
+        errors.append(f"✗ Steady state {result['steady']:.0f} ms exceeds {steady_budget_ms:g} ms")
+    if times and max(times) > steady_budget_ms:
+        errors.append(f"✗ Slowest recording {max(times):.0f} ms exceeds {steady_budget_ms:g} ms")
+    if not errors:
+        print("✓ Pipeline within latency budget")
+    return errors
 
 def main():
     """Run all tests"""
+    parser = argparse.ArgumentParser(description="Verify dependencies, model and latency")
+    parser.add_argument('--budget-ms', type=float, default=STEADY_BUDGET_MS,
+                        help="Steady-state budget per classification (default: %(default)s)")
+    parser.add_argument('--first-call-budget-ms', type=float, default=FIRST_CALL_BUDGET_MS,
+                        help="First classification budget (default: %(default)s)")
+    args = parser.parse_args()
+    
     print("="*60)
     print("Heart Sound Classifier - System Test")
     print("="*60)
@@ -145,7 +236,8 @@ def main():
     all_errors.extend(test_imports())
     all_errors.extend(test_model())
     all_errors.extend(test_dataset())
-    all_errors.extend(test_audio_processing())
+    all_errors.extend(test_adaptive_mode())
+    all_errors.extend(test_latency_budget(args.budget_ms, args.first_call_budget_ms))
     
     # Summary
     print("\n" + "="*60)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Boot-time warm-up for the classification path.
+Runs a synthetic heart-sound recording through the real extract_features
+and inference path right after startup, so lazy imports, SciPy/PyWavelets
+first-call setup, the forest's worker threads and cold model pages are
+paid for before the first Classify press. Reports first-call against
+steady-state latency.
+
+Usage:
+    python3 warmup.py [--runs 5] [--json]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from scipy.io import wavfile
+
+import audio_pipeline
+
+SYNTHETIC_SR = 8000       # Same rate as the bundled recordings
+SYNTHETIC_SECONDS = 3.0
+HEART_RATE_BPM = 72
+
+
+def synthetic_recording(sr=SYNTHETIC_SR, seconds=SYNTHETIC_SECONDS, seed=0):
+    """int16 heart-sound-like signal: S1/S2 tone bursts over low-level noise"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sr * seconds)) / sr
+    # Low-passed background noise (white noise fails the quality gate)
+    audio = 0.1 * np.convolve(rng.standard_normal(len(t)), np.ones(20) / 20, mode='same')
+    period = 60.0 / HEART_RATE_BPM
+    for beat in np.arange(0.1, seconds, period):
+        # S1 (~50 Hz) then S2 (~80 Hz) about 0.3 s later, each a decaying burst
+        for onset, freq in ((beat, 50.0), (beat + 0.3, 80.0)):
+            active = t >= onset
+            envelope = np.exp(-(t[active] - onset) / 0.03)
+            audio[active] += 0.5 * envelope * np.sin(2 * np.pi * freq * (t[active] - onset))
+    return (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+
+
+def touch_model_pages(model):
+    """
+    Read every tree array once so the pages of a freshly unpickled (or
+    swapped-out) model are resident before the first prediction
+    """
+    classifier = model['classifier']
+    total = 0.0
+    for tree in getattr(classifier, 'estimators_', []):
+        nodes = tree.tree_
+        for values in (nodes.threshold, nodes.value, nodes.children_left,
+                       nodes.children_right, nodes.feature):
+            total += float(values.sum())
+    if model['scaler'] is not None:
+        total += float(model['scaler'].mean_.sum() + model['scaler'].scale_.sum())
+    return total
+
+
+def warm_up(model, precision=None, runs=5, audio_path=None):
+    """
+    Time the first and following classifications through extract_features
+    and predict. Uses a synthetic WAV unless audio_path is given. Returns a
+    dict of milliseconds: 'touch', 'first', 'steady' (median of the rest).
+    """
+    temp_path = None
+    if audio_path is None:
+        handle, temp_path = tempfile.mkstemp(suffix='.wav')
+        os.close(handle)
+        wavfile.write(temp_path, SYNTHETIC_SR, synthetic_recording())
+        audio_path = temp_path
+    try:
+        start = time.perf_counter()
+        touch_model_pages(model)
+        touch_ms = 1000 * (time.perf_counter() - start)
+
+        times = []
+        for _ in range(max(2, runs)):
+            start = time.perf_counter()
+            features = audio_pipeline.extract_features(audio_path, model['feature_shape'],
+                                                       precision)
+            audio_pipeline.predict(model, features)
+            times.append(1000 * (time.perf_counter() - start))
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+    return {'touch': touch_ms, 'first': times[0], 'steady': float(np.median(times[1:]))}
+
+
+def describe(result):
+    """One-line summary of a warm-up result"""
+    return (f"Warm-up: first call {result['first']:.0f} ms, steady {result['steady']:.0f} ms "
+            f"(model pages touched in {result['touch']:.0f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure first-call vs steady-state latency")
+    parser.add_argument('--runs', type=int, default=5,
+                        help="Classifications to time (default: %(default)s)")
+    parser.add_argument('--json', action='store_true',
+                        help="Print the timings (ms) as one JSON line")
+    args = parser.parse_args()
+
+    # Cold start as the GUI sees it: timing includes loading the model
+    start = time.perf_counter()
+    model = audio_pipeline.load_model()
+    load_ms = 1000 * (time.perf_counter() - start)
+    result = warm_up(model, runs=args.runs)
+    if args.json:
+        print(json.dumps(dict(result, load=load_ms)))
+        return
+    print(f"Model load: {load_ms:.0f} ms")
+    print(describe(result))
+
+
+if __name__ == "__main__":
+    main()
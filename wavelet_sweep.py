@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Wavelet / decomposition-level sweep from cached preprocessed signals.
+The normalized 3000-sample windows (read, resample, high-pass, z-score,
+pad/trim) are computed once for the whole dataset and cached in
+dataset_signals.npz. Each wavelet/level configuration then only runs the
+DWT and fits a forest, with configurations evaluated in parallel.
+
+Usage:
+    python3 wavelet_sweep.py                                   # coif5/db4/db8, levels 3-6
+    python3 wavelet_sweep.py --wavelets coif5 sym8 --levels 4 5 --workers 4
+    python3 wavelet_sweep.py --rebuild                          # refresh the signal cache
+"""
+
+import argparse
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pywt
+from scipy.io import wavfile
+
+import audio_pipeline
+import hardware_probe
+
+DATASET_PATH = audio_pipeline.DATASET_PATH
+SIGNAL_CACHE_PATH = Path(__file__).parent / "dataset_signals.npz"
+
+WAVELETS = ['coif5', 'db4', 'db8']
+LEVELS = [3, 4, 5, 6]
+
+# Same forest and split settings as the shipped model
+FOREST_PARAMS = {'n_estimators': 200, 'max_depth': 30, 'random_state': 42}
+TEST_SIZE = 0.3
+SPLIT_SEED = 42
+
+# Anything that changes the cached windows invalidates the cache
+CACHE_PARAMS = np.array([audio_pipeline.TARGET_SR, audio_pipeline.HIGHPASS_CUTOFF,
+                         audio_pipeline.FILTER_ORDER, audio_pipeline.TARGET_LENGTH])
+
+
+def dataset_index():
+    """(relative paths, labels, sizes, mtimes) of every bundled recording"""
+    paths = audio_pipeline.dataset_files()
+    stats = [p.stat() for p in paths]
+    return (
+        np.array([p.relative_to(DATASET_PATH.parent).as_posix() for p in paths]),
+        np.array([p.parent.name for p in paths]),
+        np.array([s.st_size for s in stats], dtype=np.int64),
+        np.array([s.st_mtime_ns for s in stats], dtype=np.int64),
+    )
+
+
+def _window(relative_path):
+    """(window, None), or (None, rejection message) if the quality gate fails"""
+    sr, audio = wavfile.read(DATASET_PATH.parent / relative_path)
+    try:
+        return audio_pipeline.preprocessed_window(audio, sr), None
+    except audio_pipeline.SignalQualityError as e:
+        return None, str(e)
+
+
+def build_signal_cache(cache_path=SIGNAL_CACHE_PATH, workers=None):
+    """
+    Preprocess every recording once and save the windows; returns the cache
+    dict. 'files', 'sizes' and 'mtimes' index every recording; 'signals'
+    and 'labels' hold only the 'usable' ones, and 'rejections' the reason
+    for each of the others.
+    """
+    files, labels, sizes, mtimes = dataset_index()
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_window, files, chunksize=16))
+    usable = np.array([window is not None for window, _ in results], dtype=bool)
+    signals = np.vstack([window for window, _ in results if window is not None])
+    cache = {
+        'files': files, 'labels': labels[usable], 'sizes': sizes, 'mtimes': mtimes,
+        'usable': usable, 'rejections': np.array([error or '' for _, error in results]),
+        'signals': signals, 'params': CACHE_PARAMS,
+        'build_seconds': np.array(time.perf_counter() - start),
+    }
+    np.savez(cache_path, **cache)
+    return cache
+
+
+def load_signal_cache(cache_path=SIGNAL_CACHE_PATH, workers=None, rebuild=False):
+    """
+    Cached windows, rebuilt when missing or when any recording or
+    preprocessing constant changed. Returns (cache dict, rebuilt flag).
+    """
+    if not rebuild and Path(cache_path).exists():
+        with np.load(cache_path) as stored:
+            cache = {key: stored[key] for key in stored.files}
+        files, _, sizes, mtimes = dataset_index()
+        fresh = ('usable' in cache
+                 and np.array_equal(cache['files'], files)
+                 and np.array_equal(cache['sizes'], sizes)
+                 and np.array_equal(cache['mtimes'], mtimes)
+                 and np.array_equal(cache['params'], CACHE_PARAMS))
+        if fresh:
+            return cache, False
+    return build_signal_cache(cache_path, workers), True
+
+
+# Cached windows and split, set once per sweep worker process
+_signals = None
+_split = None
+
+
+def _init_worker(signals, split):
+    global _signals, _split
+    warnings.filterwarnings('ignore')
+    _signals, _split = signals, split
+
+
+def evaluate_config(config):
+    """DWT features, forest fit and test metrics for one (wavelet, level)"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, f1_score
+    from sklearn.preprocessing import StandardScaler
+
+    wavelet, level = config
+    start = time.perf_counter()
+    # Natural coefficient count for this configuration, no padding/trimming
+    n_features = sum(len(c) for c in pywt.wavedec(_signals[0], wavelet, level=level)[1:])
+    features = np.vstack([audio_pipeline.dwt_features(window, n_features, wavelet, level)
+                          for window in _signals])
+    dwt_seconds = time.perf_counter() - start
+
+    train, test, y_train, y_test = _split
+    scaler = StandardScaler().fit(features[train])
+    start = time.perf_counter()
+    forest = RandomForestClassifier(n_jobs=1, **FOREST_PARAMS)
+    forest.fit(scaler.transform(features[train]), y_train)
+    fit_seconds = time.perf_counter() - start
+    predicted = forest.predict(scaler.transform(features[test]))
+    return {
+        'wavelet': wavelet,
+        'level': level,
+        'features': n_features,
+        'accuracy': accuracy_score(y_test, predicted),
+        'macro_f1': f1_score(y_test, predicted, average='macro'),
+        'dwt_ms': 1000 * dwt_seconds / len(_signals),
+        'fit_seconds': fit_seconds,
+    }
+
+
+def valid_configs(wavelets, levels):
+    """Configurations pywt can decompose a TARGET_LENGTH window with"""
+    configs, skipped = [], []
+    for wavelet in wavelets:
+        max_level = pywt.dwt_max_level(audio_pipeline.TARGET_LENGTH,
+                                       pywt.Wavelet(wavelet).dec_len)
+        for level in levels:
+            (configs if level <= max_level else skipped).append((wavelet, level))
+    return configs, skipped
+
+
+def main():
+    from sklearn.model_selection import train_test_split
+
+    parser = argparse.ArgumentParser(description="Compare wavelet/level configurations")
+    parser.add_argument('--wavelets', nargs='+', default=WAVELETS,
+                        help="Wavelets to try (default: %(default)s)")
+    parser.add_argument('--levels', nargs='+', type=int, default=LEVELS,
+                        help="Decomposition levels to try (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Parallel configurations (default: from tuning_profile.json)")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Recompute the cached preprocessed signals")
+    args = parser.parse_args()
+
+    workers = args.workers or hardware_probe.load_tuning_profile()['workers']
+    configs, skipped = valid_configs(args.wavelets, args.levels)
+    for wavelet, level in skipped:
+        print(f"✗ Skipping {wavelet} level {level}: too deep for {audio_pipeline.TARGET_LENGTH} samples")
+
+    cache, rebuilt = load_signal_cache(workers=workers, rebuild=args.rebuild)
+    build_seconds = float(cache['build_seconds'])
+    print(f"{'✓ Built' if rebuilt else '✓ Loaded'} signal cache: {len(cache['signals'])} windows "
+          f"(preprocessing takes {build_seconds:.1f}s)")
+    skipped_files = cache['files'][~cache['usable']]
+    if len(skipped_files):
+        print(f"⚠ Skipped {len(skipped_files)} recordings that failed the signal-quality check:")
+        for name, error in zip(skipped_files, cache['rejections'][~cache['usable']]):
+            print(f"  ✗ {name}: {error}")
+
+    indices = np.arange(len(cache['signals']))
+    train, test = train_test_split(indices, test_size=TEST_SIZE, stratify=cache['labels'],
+                                   random_state=SPLIT_SEED)
+    split = (train, test, cache['labels'][train], cache['labels'][test])
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cache['signals'], split)) as pool:
+        results = list(pool.map(evaluate_config, configs))
+    sweep_seconds = time.perf_counter() - start
+
+    current = (audio_pipeline.WAVELET, audio_pipeline.LEVEL)
+    print("=" * 72)
+    print(f"WAVELET SWEEP ({len(train)} train / {len(test)} test, {workers} workers)")
+    print("=" * 72)
+    print(f"{'Wavelet':<9} {'Level':>5} {'Features':>9} {'Accuracy':>9} {'Macro F1':>9} "
+          f"{'DWT ms':>7} {'Fit s':>7}")
+    print("-" * 72)
+    for result in sorted(results, key=lambda r: (-r['accuracy'], -r['macro_f1'])):
+        marker = "  ← current" if (result['wavelet'], result['level']) == current else ""
+        print(f"{result['wavelet']:<9} {result['level']:>5} {result['features']:>9} "
+              f"{100 * result['accuracy']:>8.2f}% {result['macro_f1']:>9.3f} "
+              f"{result['dwt_ms']:>7.2f} {result['fit_seconds']:>7.1f}{marker}")
+    print("-" * 72)
+    uncached = sweep_seconds + build_seconds * len(configs)
+    print(f"Sweep time:   {sweep_seconds:.1f}s for {len(configs)} configurations")
+    print(f"Without cache: ~{uncached:.1f}s (preprocessing repeated per configuration), "
+          f"{uncached / sweep_seconds:.1f}x longer")
+
+
+if __name__ == "__main__":
+    main()